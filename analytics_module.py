@@ -0,0 +1,326 @@
+import glob
+import os.path
+import re
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import db_module
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+CRAWL_FILE_PATTERN = "oto_dom_wroclaw_*"
+CRAWL_DATE_REGEX = re.compile(r"(\d{2}_\d{2}_\d{4})")
+AGGREGATES_TABLE = "district_aggregates"
+# crawl_date -> file, mtime and size the cached aggregates were computed from
+AGGREGATE_SOURCES_TABLE = "district_aggregate_sources"
+# Only the columns needed for the analytics are read, descriptions are never loaded.
+USE_COLUMNS = ["prices", "location", "area", "price per square meter", "numbers_of_rooms", "urls"]
+# Modified z-score above which a price per square meter is flagged as an outlier.
+OUTLIER_THRESHOLD = 3.5
+
+
+def get_crawl_date(file_url: str):
+    """
+    Returns the crawl date encoded in a scraper output file name (oto_dom_wroclaw_dd_mm_yyyy).
+
+    :param file_url: Path of the scraper output file.
+    :type file_url: str
+    :return: The crawl date in ISO format (yyyy-mm-dd) or None if the name has no date.
+    :rtype: str
+    """
+    match = CRAWL_DATE_REGEX.search(os.path.basename(file_url))
+    if match is None:
+        return None
+    return datetime.strptime(match.group(1), '%d_%m_%Y').strftime('%Y-%m-%d')
+
+
+def find_crawl_files(pattern: str=CRAWL_FILE_PATTERN):
+    """
+    Finds scraper output files and maps them by crawl date.
+
+    If a crawl was exported to several formats, the Parquet file is preferred over Arrow and CSV.
+
+    :param pattern: Glob pattern of the scraper output files.
+    :type pattern: str
+    :return: A dictionary of crawl date -> file path, sorted by date.
+    :rtype: dict
+    """
+    preference = {".parquet": 0, ".arrows": 1}
+    crawl_files = {}
+    for file_url in sorted(glob.glob(pattern), key=lambda url: preference.get(os.path.splitext(url)[1], 2), reverse=True):
+        crawl_date = get_crawl_date(file_url)
+        if crawl_date is not None:
+            crawl_files[crawl_date] = file_url
+    return dict(sorted(crawl_files.items()))
+
+
+def iter_listing_chunks(file_url: str, chunksize: int=50000):
+    """
+    Reads a scraper output file in chunks of raw listings.
+
+    :param file_url: Path of a CSV or Parquet file written by the scraper.
+    :type file_url: str
+    :param chunksize: The number of rows per chunk.
+    :type chunksize: int
+    :return: A generator of pandas DataFrames with the USE_COLUMNS columns.
+    :rtype: Iterator[pd.DataFrame]
+    """
+    if file_url.endswith((".parquet", ".arrows")) and pa is None:
+        raise ImportError("pyarrow is required to read parquet and arrow files")
+    if file_url.endswith(".parquet"):
+        for batch in pq.ParquetFile(file_url).iter_batches(batch_size=chunksize, columns=USE_COLUMNS):
+            yield batch.to_pandas()
+    elif file_url.endswith(".arrows"):
+        with pa.OSFile(file_url, 'rb') as source:
+            for batch in pa.ipc.open_stream(source):
+                yield batch.to_pandas()[USE_COLUMNS]
+    else:
+        for chunk in pd.read_csv(file_url, usecols=USE_COLUMNS, dtype=str, chunksize=chunksize, encoding="utf-8"):
+            yield chunk
+
+
+def parse_numeric(series: pd.Series):
+    """
+    Vectorized conversion of scraped numeric strings ("650000", "48,5", "12 345") to floats.
+
+    Missing values and placeholders like "brak informacji" become NaN.
+
+    :param series: A column of raw scraped values.
+    :type series: pd.Series
+    :return: A float64 series.
+    :rtype: pd.Series
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("float64")
+    cleaned = series.astype("string").str.replace(r"[\s\xa0]", "", regex=True).str.replace(",", ".", regex=False)
+    return pd.to_numeric(cleaned, errors="coerce").astype("float64")
+
+
+def clean_listings(listings: pd.DataFrame):
+    """
+    Vectorized cleaning of a chunk of raw listings.
+
+    Parses prices, areas and numbers of rooms, recomputes the price per square meter from the
+    parsed price and area and extracts the district from the location string
+    ("ul. Street, District, Wrocław, dolnośląskie").
+
+    :param listings: Raw listings as read by iter_listing_chunks.
+    :type listings: pd.DataFrame
+    :return: A DataFrame with url, district, price, area, rooms, price_per_m2 and scraped_price_per_m2 columns.
+    :rtype: pd.DataFrame
+    """
+    price = parse_numeric(listings["prices"])
+    area = parse_numeric(listings["area"])
+    area = area.where(area > 0)
+    location_parts = listings["location"].astype("string").str.split(",")
+    district = location_parts.str[-3].str.strip()
+    district = district.fillna(location_parts.str[0].str.strip()).fillna("brak informacji")
+    return pd.DataFrame({
+        "url": listings["urls"].astype("string"),
+        "district": district.astype("category"),
+        "price": price,
+        "area": area,
+        "rooms": parse_numeric(listings["numbers_of_rooms"]),
+        "price_per_m2": price / area,
+        "scraped_price_per_m2": parse_numeric(listings["price per square meter"]),
+    })
+
+
+def flag_outliers(listings: pd.DataFrame, threshold: float=OUTLIER_THRESHOLD):
+    """
+    Flags listings whose price per square meter is an outlier within their district.
+
+    Uses the modified z-score of log(price per square meter) based on the district median and
+    median absolute deviation, so a few absurd offers don't distort the statistics.
+
+    :param listings: Cleaned listings as returned by clean_listings.
+    :type listings: pd.DataFrame
+    :param threshold: The modified z-score above which a listing is flagged.
+    :type threshold: float
+    :return: The same DataFrame with an added boolean 'is_outlier' column.
+    :rtype: pd.DataFrame
+    """
+    log_price = np.log(listings["price_per_m2"])
+    grouped = log_price.groupby(listings["district"], observed=True)
+    median = grouped.transform("median")
+    mad = (log_price - median).abs().groupby(listings["district"], observed=True).transform("median")
+    z_score = 0.6745 * (log_price - median) / mad.replace(0, np.nan)
+    listings["is_outlier"] = (z_score.abs() > threshold).to_numpy()
+    return listings
+
+
+def load_crawl(file_url: str, chunksize: int=50000):
+    """
+    Loads, cleans and flags all listings of a single crawl.
+
+    The file is read in chunks and only the cleaned numeric columns are kept in memory.
+    Offers scraped several times in one crawl (listed on several pages) are counted once.
+
+    :param file_url: Path of a scraper output file.
+    :type file_url: str
+    :param chunksize: The number of rows per chunk.
+    :type chunksize: int
+    :return: Cleaned listings with an 'is_outlier' column.
+    :rtype: pd.DataFrame
+    """
+    chunks = [clean_listings(chunk) for chunk in iter_listing_chunks(file_url, chunksize)]
+    if not chunks:
+        return flag_outliers(clean_listings(pd.DataFrame(columns=USE_COLUMNS)))
+    listings = pd.concat(chunks, ignore_index=True)
+    listings["district"] = listings["district"].astype("category")
+    listings = listings.drop_duplicates(subset="url", keep="last", ignore_index=True)
+    return flag_outliers(listings)
+
+
+def compute_district_aggregates(listings: pd.DataFrame, crawl_date: str):
+    """
+    Computes per-district statistics of a crawl, ignoring outliers in the price statistics.
+
+    :param listings: Listings as returned by load_crawl.
+    :type listings: pd.DataFrame
+    :param crawl_date: The crawl date in ISO format.
+    :type crawl_date: str
+    :return: A DataFrame with one row per district.
+    :rtype: pd.DataFrame
+    """
+    valid = listings[~listings["is_outlier"]]
+    aggregates = valid.groupby("district", observed=True).agg(
+        median_price=("price", "median"),
+        mean_price=("price", "mean"),
+        median_area=("area", "median"),
+        median_price_per_m2=("price_per_m2", "median"),
+        mean_price_per_m2=("price_per_m2", "mean"),
+    )
+    by_district = listings.groupby("district", observed=True)
+    aggregates = aggregates.reindex(by_district.size().index)
+    aggregates.insert(0, "offers", by_district.size())
+    aggregates["outliers"] = by_district["is_outlier"].sum().astype("int64")
+    aggregates = aggregates.reset_index()
+    aggregates["district"] = aggregates["district"].astype(str)
+    aggregates.insert(0, "crawl_date", crawl_date)
+    return aggregates
+
+
+def create_aggregates_table(db):
+    """
+    Creates the district aggregates cache tables (if needed) with an index on the crawl date.
+
+    :param db: The database used as the aggregates cache.
+    :type db: db_module.Database
+    """
+    if not db.check_table_exists(AGGREGATES_TABLE):
+        db.create_table(AGGREGATES_TABLE, "crawl_date TEXT", "district TEXT", "offers INTEGER", "median_price REAL", "mean_price REAL",
+                        "median_area REAL", "median_price_per_m2 REAL", "mean_price_per_m2 REAL", "outliers INTEGER")
+        db.cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{AGGREGATES_TABLE}_crawl_date ON {AGGREGATES_TABLE} (crawl_date)")
+        db.conn.commit()
+    if not db.check_table_exists(AGGREGATE_SOURCES_TABLE):
+        db.create_table(AGGREGATE_SOURCES_TABLE, "crawl_date TEXT PRIMARY KEY", "file_url TEXT", "mtime REAL", "size INTEGER")
+
+
+def get_file_signature(file_url: str):
+    """
+    Returns the (file path, mtime, size) signature of a crawl file, which changes while a crawl is still writing it.
+
+    :param file_url: Path of the crawl file.
+    :type file_url: str
+    :return: The signature tuple.
+    :rtype: tuple
+    """
+    stat = os.stat(file_url)
+    return (file_url, stat.st_mtime, stat.st_size)
+
+
+def update_district_aggregates(db, crawl_files: dict=None, chunksize: int=50000):
+    """
+    Computes and caches district aggregates of every crawl which is not cached yet, or whose file changed
+    since it was cached (a crawl still being written, or a re-crawl of the same day).
+
+    :param db: The database used as the aggregates cache.
+    :type db: db_module.Database
+    :param crawl_files: A dictionary of crawl date -> file path. Defaults to find_crawl_files().
+    :type crawl_files: dict
+    :param chunksize: The number of rows per chunk when reading crawl files.
+    :type chunksize: int
+    :return: The list of crawl dates computed in this call.
+    :rtype: list
+    """
+    if crawl_files is None:
+        crawl_files = find_crawl_files()
+    create_aggregates_table(db)
+    db.cur.execute(f"SELECT crawl_date, file_url, mtime, size FROM {AGGREGATE_SOURCES_TABLE}")
+    cached_sources = {row[0]: tuple(row[1:]) for row in db.cur.fetchall()}
+
+    computed_dates = []
+    for crawl_date, file_url in crawl_files.items():
+        signature = get_file_signature(file_url)
+        if cached_sources.get(crawl_date) == signature:
+            continue
+        print(f"Computing district aggregates for {crawl_date} ({file_url})")
+        aggregates = compute_district_aggregates(load_crawl(file_url, chunksize), crawl_date)
+        db.cur.execute(f"DELETE FROM {AGGREGATES_TABLE} WHERE crawl_date = ?", (crawl_date,))
+        aggregates.to_sql(AGGREGATES_TABLE, db.conn, if_exists="append", index=False)
+        # Recorded even for an empty crawl, so it isn't recomputed on every run
+        db.cur.execute(f"INSERT OR REPLACE INTO {AGGREGATE_SOURCES_TABLE} VALUES(?, ?, ?, ?)", (crawl_date,) + signature)
+        computed_dates.append(crawl_date)
+    db.conn.commit()
+    return computed_dates
+
+
+def get_district_aggregates(db, start_date: str=None, end_date: str=None, update: bool=True):
+    """
+    Returns cached district aggregates, optionally limited to a range of crawl dates.
+
+    :param db: The database used as the aggregates cache.
+    :type db: db_module.Database
+    :param start_date: The first crawl date (yyyy-mm-dd) to return.
+    :type start_date: str
+    :param end_date: The last crawl date (yyyy-mm-dd) to return.
+    :type end_date: str
+    :param update: Whether to compute aggregates of new crawl files first.
+    :type update: bool
+    :return: A DataFrame of district aggregates sorted by crawl date and district.
+    :rtype: pd.DataFrame
+
+    Example usage:
+    ```python
+    db = db_module.Database("web_scraper_data_base")
+    aggregates = get_district_aggregates(db, start_date="2023-10-01")
+    ```
+    """
+    if update:
+        update_district_aggregates(db)
+    else:
+        create_aggregates_table(db)
+    query = f"SELECT * FROM {AGGREGATES_TABLE} WHERE crawl_date >= ? AND crawl_date <= ? ORDER BY crawl_date, district"
+    return pd.read_sql_query(query, db.conn, params=(start_date or "0000-00-00", end_date or "9999-99-99"))
+
+
+def daily_report(db, value: str="median_price_per_m2", start_date: str=None, end_date: str=None):
+    """
+    Returns a district x crawl date table of one aggregate, e.g. the median price per square meter.
+
+    :param db: The database used as the aggregates cache.
+    :type db: db_module.Database
+    :param value: The aggregate column to report.
+    :type value: str
+    :return: A pivoted DataFrame with districts as rows and crawl dates as columns.
+    :rtype: pd.DataFrame
+    """
+    aggregates = get_district_aggregates(db, start_date, end_date)
+    return aggregates.pivot(index="district", columns="crawl_date", values=value)
+
+
+def main():
+
+    db = db_module.Database("web_scraper_data_base")
+    pd.set_option("display.width", 200)
+    print(daily_report(db))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+from urllib.parse import urlsplit
+
+OK = "ok"
+NOT_FOUND = "not_found"
+BLOCKED = "blocked"
+CAPTCHA = "captcha"
+SOFT_BAN = "soft_ban"
+LOGIN_REDIRECT = "login_redirect"
+EMPTY_LISTING = "empty_listing"
+
+# Verdicts meaning the proxy (not the url) is the problem: quarantine it and retry elsewhere.
+PROXY_FAILURES = [BLOCKED, CAPTCHA, SOFT_BAN, LOGIN_REDIRECT]
+
+NOT_FOUND_STATUSES = [404, 410]
+SOFT_BAN_STATUSES = [429]
+BLOCKED_STATUSES = [401, 403, 407, 451, 503]
+LOGIN_URL_MARKERS = ["/login", "/logowanie", "/konto", "/account"]
+# Real otodom pages are hundreds of KB, block and captcha pages are small.
+MIN_PAGE_BYTES = 2 * 1024
+MAX_BLOCK_PAGE_BYTES = 150 * 1024
+SNIFF_BYTES = 32 * 1024
+# Challenge specific markers only: a generic "captcha" also matches real pages loading reCAPTCHA (e.g. for a contact form)
+CAPTCHA_MARKERS = [b"cf-chl-", b"challenge-platform", b"datadome", b"_px3"]
+BLOCK_MARKERS = [b"access denied", b"request blocked", b"too many requests", b"attention required", b"you have been blocked", b"ip address has been blocked"]
+# Present on every result page with at least one offer. Pages linking to offers are real content, they are
+# never classified as captcha or block pages.
+LISTING_MARKER = b"/pl/oferta/"
+
+
+def classify_response(response, page_type: str=None):
+    """
+    Classify a response before parsing it, using only the status, url and cheap byte-level checks.
+
+    Args:
+    response (requests.Response): A response with the body already read.
+    page_type (str, optional): "listing" for search result pages, enables the empty listing check.
+
+    Returns:
+    str: One of OK, NOT_FOUND, BLOCKED, CAPTCHA, SOFT_BAN, LOGIN_REDIRECT or EMPTY_LISTING.
+    """
+    if response is None:
+        return SOFT_BAN
+    if response.status_code in NOT_FOUND_STATUSES:
+        return NOT_FOUND
+    if response.status_code in SOFT_BAN_STATUSES:
+        return SOFT_BAN
+    if response.status_code in BLOCKED_STATUSES:
+        return BLOCKED
+
+    final_path = urlsplit(response.url or "").path.lower()
+    if any(marker in final_path for marker in LOGIN_URL_MARKERS):
+        return LOGIN_REDIRECT
+
+    body = response.content or b""
+    if len(body) < MIN_PAGE_BYTES:
+        return SOFT_BAN
+    if len(body) < MAX_BLOCK_PAGE_BYTES and LISTING_MARKER not in body:
+        head = body[:SNIFF_BYTES].lower()
+        if any(marker in head for marker in CAPTCHA_MARKERS):
+            return CAPTCHA
+        if any(marker in head for marker in BLOCK_MARKERS):
+            return BLOCKED
+
+    if page_type == "listing" and LISTING_MARKER not in body:
+        return EMPTY_LISTING
+    return OK
@@ -0,0 +1,125 @@
+import argparse
+import sys
+import config_module
+import export_module
+import profiling_module
+import web_scraper
+
+
+def build_parser():
+    """
+    Build the command line parser of the 'scrape', 'proxies' and 'export' commands.
+
+    Returns:
+    argparse.ArgumentParser: The parser.
+    """
+    # Options shared by every command
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-c", "--config", help=f"INI config file (default: {config_module.DEFAULT_CONFIG_FILE} if it exists)")
+    common.add_argument("--crawl-profile", help="apply the [crawl_profile:NAME] section of the config file")
+    common.add_argument("--set", dest="overrides", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                        help="override a setting, e.g. --set network.timeout=6 (repeatable)")
+
+    parser = argparse.ArgumentParser(description="Otodom scraper with a rotating proxy pool.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scrape = commands.add_parser("scrape", parents=[common], help="scrape the offers of the configured search url")
+    scrape.add_argument("--profile", nargs="?", const="profile", metavar="OUTPUT_PREFIX",
+                        help="profile the run, writing OUTPUT_PREFIX.txt/.pstats/.collapsed (default prefix: profile)")
+    scrape.add_argument("--profile-memory", action="store_true",
+                        help="with --profile, trace allocations instead of timing the run (a separate, much slower pass)")
+    scrape.add_argument("--replay", metavar="CORPUS_DIR", help="serve pages from a corpus instead of the network")
+    scrape.add_argument("--corpus", metavar="CORPUS_DIR", help="store fetched pages in a corpus")
+    scrape.add_argument("--mode", choices=["full", "summary"], help="full: fetch every offer page, summary: only the pages of new offers (default: scrape.mode)")
+    scrape.add_argument("--no-import", action="store_true", help="keep the unchecked proxies instead of re-importing the proxy file")
+    scrape.add_argument("--cold-start", action="store_true", help="ignore the proxy pool snapshot")
+
+    proxies = commands.add_parser("proxies", help="manage the proxy pool")
+    proxies_commands = proxies.add_subparsers(dest="proxies_command", required=True)
+    proxies_import = proxies_commands.add_parser("import", parents=[common], help="replace the unchecked proxies with a proxy file")
+    proxies_import.add_argument("proxy_file", nargs="?", help="proxy file, one proxy per line (default: proxies.proxy_file)")
+    proxies_commands.add_parser("check", parents=[common], help="check unchecked and not working proxies")
+    proxies_commands.add_parser("stats", parents=[common], help="print the number of proxies per table")
+
+    export = commands.add_parser("export", parents=[common], help="convert a scraped CSV file to Parquet / Arrow")
+    export.add_argument("input", help="the CSV file")
+    export.add_argument("--format", choices=["parquet", "arrow"], help="output format (default: output.format)")
+    return parser
+
+
+def print_proxy_stats(db):
+    for table_name in ("proxies_unchecked", "proxies_working", "proxies_not_working"):
+        print(f"{table_name[len('proxies_'):]:>12}: {db.get_row_count(table_name)}")
+    print(f"{'quarantined':>12}: {sum(web_scraper.is_quarantined(proxy) for proxy in list(web_scraper.proxy_cooldowns))}")
+
+
+def main(argv=None):
+    """
+    Run a command line command.
+
+    Args:
+    argv (list, optional): The arguments, sys.argv[1:] by default.
+
+    Returns:
+    int: The exit code, 2 if the settings are invalid.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "scrape" and args.profile_memory and args.profile is None:
+        parser.error("--profile-memory requires --profile")
+    overrides = list(args.overrides)
+    if args.command == "scrape":
+        if args.replay is not None:
+            overrides.append("scrape.replay_dir=" + args.replay)
+        if args.corpus is not None:
+            overrides.append("scrape.corpus_dir=" + args.corpus)
+        if args.mode is not None:
+            overrides.append("scrape.mode=" + args.mode)
+    if args.command == "proxies" and args.proxies_command == "import" and args.proxy_file is not None:
+        overrides.append("proxies.proxy_file=" + args.proxy_file)
+
+    try:
+        settings = config_module.load_settings(args.config, args.crawl_profile, overrides)
+    except config_module.ConfigError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    if args.command == "export":
+        output_format = args.format or settings["output"]["format"]
+        if output_format == "csv":
+            print("Choose --format parquet or arrow (output.format is csv)", file=sys.stderr)
+            return 2
+        compression_error = config_module.check_compression(output_format, settings["output"]["compression"])
+        if compression_error is not None:
+            print(compression_error, file=sys.stderr)
+            return 2
+        compression = None if settings["output"]["compression"] == "none" else settings["output"]["compression"]
+        print(export_module.convert_csv(args.input, output_format, row_group_size=settings["output"]["row_group_size"], compression=compression))
+        return 0
+
+    web_scraper.configure(settings)
+
+    if args.command == "scrape":
+        web_scraper.setup_logging()
+        web_scraper.setup_pool(import_proxies=not args.no_import, warm_start=not args.cold_start)
+        if args.profile is not None:
+            profiling_module.run_profiled(web_scraper.main, args.profile, trace_memory=args.profile_memory)
+        else:
+            web_scraper.main()
+        return 0
+
+    if args.proxies_command == "import":
+        db = web_scraper.setup_database(import_proxies=True)
+    else:
+        # Restore the snapshot statistics, without re-checking, so saving it doesn't lose them
+        web_scraper.setup_pool(import_proxies=False, probes=0)
+        db = web_scraper.db
+    if args.proxies_command == "check":
+        web_scraper.setup_logging()
+        web_scraper.check_proxies(db)
+        web_scraper.save_pool_snapshot()
+    print_proxy_stats(db)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import configparser
+import os.path
+import export_module
+
+DEFAULT_CONFIG_FILE = "scraper.ini"
+CRAWL_PROFILE_PREFIX = "crawl_profile:"
+OUTPUT_FORMATS = ["csv", "parquet", "arrow"]
+
+
+def parse_list(value: str):
+    return [int(item) for item in value.replace(" ", "").split(",") if item]
+
+
+# (section, key) -> (parser, default, validator, description of valid values)
+SETTINGS_SCHEMA = {
+    ("scrape", "url"): (str, "https://www.otodom.pl/pl/wyniki/sprzedaz/mieszkanie/dolnoslaskie/wroclaw/wroclaw/wroclaw?limit=36&ownerTypeSingleSelect=ALL&by=DEFAULT&direction=DESC&viewType=listing",
+                        lambda value: value.startswith(("http://", "https://")), "an http(s) url"),
+    ("scrape", "output_file_prefix"): (str, "oto_dom_wroclaw_", bool, "a non-empty file name"),
+    ("scrape", "mode"): (str, "full", lambda value: value in ("full", "summary"), "full / summary"),
+    ("scrape", "selector_sample_size"): (int, 36, lambda value: value > 0, "> 0"),
+    ("scrape", "min_selector_hit_rate"): (float, 0.5, lambda value: 0 <= value <= 1, "between 0 and 1"),
+    ("scrape", "corpus_dir"): (str, "", None, ""),
+    ("scrape", "replay_dir"): (str, "", lambda value: not value or os.path.isdir(value), "an existing directory"),
+    ("network", "timeout"): (float, 4.0, lambda value: value > 0, "> 0"),
+    ("network", "max_body_bytes"): (int, 5 * 1024 * 1024, lambda value: value >= 64 * 1024, ">= 65536"),
+    ("network", "valid_statuses"): (parse_list, "200, 301, 302, 307, 404", lambda value: value and all(100 <= status < 600 for status in value), "a list of HTTP statuses"),
+    ("network", "quarantine_seconds"): (int, 600, lambda value: value >= 0, ">= 0"),
+    ("network", "concurrency"): (int, 8, lambda value: 1 <= value <= 256, "between 1 and 256"),
+    ("proxies", "database"): (str, "web_scraper_data_base", bool, "a non-empty file name"),
+    ("proxies", "proxy_file"): (str, "proxy_list.txt", bool, "a non-empty file name"),
+    ("proxies", "check_url"): (str, "http://ident.me/", lambda value: value.startswith(("http://", "https://")), "an http(s) url"),
+    ("proxies", "min_working"): (int, 15, lambda value: value >= 1, ">= 1"),
+    ("proxies", "target_working"): (int, 50, lambda value: value >= 1, ">= 1"),
+    ("proxies", "unchecked_batch"): (int, 100, lambda value: value >= 1, ">= 1"),
+    ("proxies", "not_working_batch"): (int, 20, lambda value: value >= 0, ">= 0"),
+    ("proxies", "snapshot_file"): (str, "proxy_pool.json.gz", None, ""),
+    ("proxies", "snapshot_interval"): (float, 60.0, lambda value: value > 0, "> 0"),
+    ("proxies", "snapshot_max_age"): (float, 24 * 3600.0, lambda value: value > 0, "> 0"),
+    ("proxies", "warm_start_probes"): (int, 20, lambda value: value >= 0, ">= 0"),
+    ("output", "format"): (str, "csv", lambda value: value in OUTPUT_FORMATS, " / ".join(OUTPUT_FORMATS)),
+    ("output", "row_group_size"): (int, 5000, lambda value: value > 0, "> 0"),
+    ("output", "compression"): (str, "zstd", lambda value: value in ("zstd", "snappy", "gzip", "lz4", "none"), "zstd / snappy / gzip / lz4 / none"),
+}
+
+
+def check_compression(output_format: str, compression: str):
+    """
+    Check that an output format supports a compression codec (e.g. Arrow IPC only supports lz4 and zstd).
+
+    Args:
+    output_format (str): "csv", "parquet" or "arrow".
+    compression (str): The output.compression setting.
+
+    Returns:
+    str: The error message, or None if the combination is valid.
+    """
+    if output_format not in export_module.FORMAT_COMPRESSIONS:
+        return None
+    supported = export_module.FORMAT_COMPRESSIONS[output_format]
+    if (None if compression == "none" else compression) not in supported:
+        supported_names = ["none" if codec is None else codec for codec in supported]
+        return f"Invalid value {compression!r} for output.compression with output.format = {output_format}, expected {' / '.join(supported_names)}"
+    return None
+
+
+class ConfigError(ValueError):
+    """
+    Raised when the configuration file or overrides contain invalid settings. Lists every error at once.
+    """
+
+
+def load_settings(config_file: str=None, crawl_profile: str=None, overrides=None):
+    """
+    Load and validate the settings from the defaults, a config file, a crawl profile and overrides.
+
+    Values are applied in that order. A crawl profile is a '[crawl_profile:NAME]' section of the config file
+    whose keys are "section.key" names, e.g. 'network.timeout = 2'.
+
+    Args:
+    config_file (str, optional): Path of the INI config file. Defaults to scraper.ini if it exists.
+    crawl_profile (str, optional): Name of the crawl profile to apply.
+    overrides (list, optional): "section.key=value" strings, e.g. from the --set command line option.
+
+    Returns:
+    dict: Settings as {section: {key: value}} with parsed values.
+
+    Raises:
+    ConfigError: If the file is missing, a setting is unknown or a value is invalid.
+    """
+    parser = configparser.ConfigParser(interpolation=None)
+    if config_file is not None:
+        if not os.path.isfile(config_file):
+            raise ConfigError(f"Config file {config_file} does not exist.")
+        parser.read(config_file, encoding="utf-8")
+    elif os.path.isfile(DEFAULT_CONFIG_FILE):
+        parser.read(DEFAULT_CONFIG_FILE, encoding="utf-8")
+
+    raw_values = {name: str(default) for name, (_, default, _, _) in SETTINGS_SCHEMA.items()}
+    errors = []
+
+    for section in parser.sections():
+        if section.startswith(CRAWL_PROFILE_PREFIX):
+            continue
+        for key, value in parser.items(section):
+            if (section, key) not in SETTINGS_SCHEMA:
+                errors.append(f"Unknown setting [{section}] {key}")
+            raw_values[(section, key)] = value
+
+    profile_assignments = []
+    if crawl_profile is not None:
+        profile_section = CRAWL_PROFILE_PREFIX + crawl_profile
+        if not parser.has_section(profile_section):
+            available_profiles = [section[len(CRAWL_PROFILE_PREFIX):] for section in parser.sections() if section.startswith(CRAWL_PROFILE_PREFIX)]
+            errors.append(f"Unknown crawl profile {crawl_profile!r}, available: {available_profiles}")
+        else:
+            profile_assignments = [f"{name}={value}" for name, value in parser.items(profile_section)]
+
+    for assignment in profile_assignments + list(overrides or []):
+        name, separator, value = assignment.partition("=")
+        section, dot, key = name.strip().partition(".")
+        if not separator or not dot:
+            errors.append(f"Invalid setting {assignment!r}, expected section.key=value")
+        elif (section, key) not in SETTINGS_SCHEMA:
+            errors.append(f"Unknown setting {name.strip()}")
+        else:
+            raw_values[(section, key)] = value.strip()
+
+    settings = {}
+    for (section, key), raw_value in raw_values.items():
+        if (section, key) not in SETTINGS_SCHEMA:
+            continue
+        parse, _, validate, valid_values = SETTINGS_SCHEMA[(section, key)]
+        try:
+            value = parse(raw_value)
+        except ValueError:
+            errors.append(f"Invalid value {raw_value!r} for {section}.{key}, expected {parse.__name__}")
+            continue
+        if validate is not None and not validate(value):
+            errors.append(f"Invalid value {raw_value!r} for {section}.{key}, expected {valid_values}")
+            continue
+        settings.setdefault(section, {})[key] = value
+
+    if not errors and settings["proxies"]["min_working"] > settings["proxies"]["target_working"]:
+        errors.append("proxies.min_working must not be greater than proxies.target_working")
+    if not errors:
+        compression_error = check_compression(settings["output"]["format"], settings["output"]["compression"])
+        if compression_error is not None:
+            errors.append(compression_error)
+    if errors:
+        raise ConfigError("Invalid configuration:\n  " + "\n  ".join(errors))
+    return settings
@@ -3,6 +3,54 @@ import os
 import os.path
 import pandas as pd
 
+# Number of prepared statements kept by sqlite3 per connection. Queries use bound parameters,
+# so the same SQL text (and the same compiled statement) is reused for different values.
+STATEMENT_CACHE_SIZE = 256
+COMPARISON_OPERATORS = ["<", ">", "<=", ">=", "=", "==", "!=", "LIKE", "BETWEEN"]
+
+
+def build_conditions(condition_operator: str="AND", **kwargs):
+    """
+    Builds a parameterized WHERE clause from "column_name" = "value" or "column_name" = "comparison_operator__value" pairs.
+
+    :param condition_operator: The operator joining the conditions ("AND" or "OR").
+    :type condition_operator: str
+    :param kwargs: Conditions in the get_table_df_with_conditions format.
+    :return: A tuple of the WHERE clause (empty string if there are no conditions) and its parameters.
+    :rtype: tuple
+    :raises ValueError: If a comparison or condition operator is not supported.
+
+    Example usage:
+    ```python
+    where_clause, params = build_conditions(age = ">__18", city = "!=__New York")
+    # where_clause == "WHERE age > ? AND city != ?", params == ["18", "New York"]
+    ```
+    """
+    if condition_operator.upper() not in ("AND", "OR"):
+        raise ValueError("condition_operator must be 'AND' or 'OR'")
+    conditions = []
+    params = []
+    for column_name, value in kwargs.items():
+        if isinstance(value, str) and "__" in value:
+            comparison_operator, value = value.split('__', 1)
+        else:
+            comparison_operator = "=="
+        if comparison_operator not in COMPARISON_OPERATORS:
+            raise ValueError(f"comparison_operator must be one of {COMPARISON_OPERATORS}")
+
+        if comparison_operator == "BETWEEN":
+            values = value.split(' ')
+            conditions.append(f"{column_name} BETWEEN ? AND ?")
+            params.extend([values[0], values[2]])
+        else:
+            conditions.append(f"{column_name} {comparison_operator} ?")
+            params.append(value)
+
+    if not conditions:
+        return "", params
+    return "WHERE " + f" {condition_operator} ".join(conditions), params
+
+
 class Database:
     """
     A class for interacting with an SQLite database.
@@ -36,6 +84,22 @@ class Database:
     - get_table_df_with_conditions(self, table_name: str, *column_names, condition_operator: str = "AND", limit: int = None, **kwargs): 
         Retrieves data from a specified table with specified conditions and returns it as a pandas DataFrame.
 
+    - iter_rows(self, table_name: str, *column_names, chunk_size: int = 1000, condition_operator: str = "AND", **kwargs):
+        Streams rows from a specified table using fetchmany() and bound parameters.
+
+    - iter_table_df(self, table_name: str, *column_names, chunksize: int = 10000, condition_operator: str = "AND", **kwargs):
+        Streams a specified table as chunked pandas DataFrames using bound parameters.
+
+    - get_row_count(self, table_name: str): Retrieves the number of rows in a specified table.
+
+    - get_column(self, table_name: str, column_name: str): Retrieves all values of a column.
+
+    - get_row_by_id(self, table_name: str, id_value: int): Retrieves a row by its ID.
+
+    - check_value_in_column(self, table_name: str, column_name: str, value): Checks if a value exists in a column.
+
+    - delete_row(self, table_name: str, condition_column: str, condition_value): Deletes rows matching a value.
+
     - insert_row(self, table_name: str, *values): Inserts a new row into the specified table in the database.
 
     - get_first_row_value(self, table_name: str, *column_names): Retrieves values from the first row of specified columns.
@@ -70,14 +134,14 @@ class Database:
         """        
         if os.path.isfile(database_name):
             print(f"{database_name} exists in the current directory.")
-            self.conn = sqlite3.connect(database_name)
+            self.conn = sqlite3.connect(database_name, cached_statements=STATEMENT_CACHE_SIZE)
             self.cur = self.conn.cursor()
             self.name = database_name
             print(f"Connected to {database_name}. ")
         else:
             print(f"{database_name} does not exist in the current directory.")
             print(f"Creating {database_name} data base ....................")
-            self.conn = sqlite3.connect(database_name)
+            self.conn = sqlite3.connect(database_name, cached_statements=STATEMENT_CACHE_SIZE)
             self.cur = self.conn.cursor()
             self.name = database_name
             print(f"DONE -> {database_name}  created.")
@@ -239,7 +303,7 @@ class Database:
         table_data = self.cur.fetchall()
         return table_data
 
-    def get_table_df(self, table_name: str, *column_names, sort_col: str=None, sort_order: str=None, where_condition: str=None):
+    def get_table_df(self, table_name: str, *column_names, sort_col: str=None, sort_order: str=None, where_condition: str=None, params=None):
         """
         Returns a pandas DataFrame with the specified columns or all columns of a given SQLite table.
         Optionally, the function can also sort the DataFrame by a specified column and sort order.
@@ -252,6 +316,10 @@ class Database:
         :type sort_col: str
         :param sort_order: The sort order to apply to the specified column. It can be "ASC" for ascending order or "DESC" for descending order.
         :type sort_order: str
+        :param where_condition: An SQL condition, use "?" placeholders for values.
+        :type where_condition: str
+        :param params: Values bound to the "?" placeholders of where_condition.
+        :type params: tuple
         :return: A pandas DataFrame with the selected columns (or all columns if no columns are specified) and optionally sorted by the specified column.
         :rtype: pd.DataFrame
         :raises ValueError: If sort_order is not "ASC" or "DESC" or None.
@@ -278,7 +346,7 @@ class Database:
                 raise ValueError("sort_order must be 'asc' or 'desc'")
 
         print(query)
-        table_df = pd.read_sql_query(query, self.conn)
+        table_df = pd.read_sql_query(query, self.conn, params=params)
         return table_df
     
     def get_table_df_with_conditions(self, table_name: str, *column_names, condition_operator: str="AND", limit: int=None, **kwargs): 
@@ -307,29 +375,151 @@ class Database:
         
         query = f"SELECT {column_string} FROM {table_name}"
 
-        conditions = []
-        for column_name, value in kwargs.items():
-            if "__" in value:
-                comparison_operator, value = value.split('__')
-            else:
-                comparison_operator = "=="   
-                
-            if comparison_operator == "BETWEEN":
-                values = value.split(' ')
-                conditions.append(f"""{column_name} {comparison_operator} '{values[0]}' AND '{values[2]}' """)
-            else:
-                conditions.append(f"""{column_name} {comparison_operator} '{value}' """)
-
-        if conditions:
-            condition_statement = f" {condition_operator} ".join(conditions)
-            where_clause = "WHERE " + condition_statement
+        where_clause, params = build_conditions(condition_operator, **kwargs)
+        if where_clause:
             query += " " + where_clause
         
         if limit:
-            query += f" LIMIT {limit}"
+            query += " LIMIT ?"
+            params.append(int(limit))
         print(query)
-        result_df = pd.read_sql(query, self.conn)
+        result_df = pd.read_sql(query, self.conn, params=params)
         return result_df
+
+    def iter_rows(self, table_name: str, *column_names, chunk_size: int=1000, condition_operator: str="AND", **kwargs):
+        """
+        Streams rows from the specified table without loading the whole table into memory.
+
+        Rows are fetched with fetchmany() on a dedicated cursor, so other queries can run while iterating.
+
+        :param table_name: The name of the table to retrieve data from.
+        :type table_name: str
+        :param column_names: The names of the columns to be selected. If no column names are provided, all columns will be selected.
+        :type column_names: str
+        :param chunk_size: The number of rows fetched from SQLite at once.
+        :type chunk_size: int
+        :param condition_operator: The operator joining multiple conditions ("AND" or "OR").
+        :type condition_operator: str
+        :param kwargs: Conditions in the get_table_df_with_conditions format, values are bound as parameters.
+        :return: A generator of row tuples.
+        :rtype: Iterator[tuple]
+
+        Example usage:
+        ```python
+        # Streaming the names of employees older than 18
+        for (name,) in db.iter_rows("employees", "name", age = ">__18"):
+            print(name)
+        ```
+        """
+        column_string = ", ".join(column_names) if column_names else "*"
+        where_clause, params = build_conditions(condition_operator, **kwargs)
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"SELECT {column_string} FROM '{table_name}' {where_clause}", params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+    def iter_table_df(self, table_name: str, *column_names, chunksize: int=10000, condition_operator: str="AND", **kwargs):
+        """
+        Streams the specified table as chunked pandas DataFrames.
+
+        :param table_name: The name of the table to retrieve data from.
+        :type table_name: str
+        :param column_names: The names of the columns to be selected. If no column names are provided, all columns will be selected.
+        :type column_names: str
+        :param chunksize: The number of rows per DataFrame.
+        :type chunksize: int
+        :param condition_operator: The operator joining multiple conditions ("AND" or "OR").
+        :type condition_operator: str
+        :param kwargs: Conditions in the get_table_df_with_conditions format, values are bound as parameters.
+        :return: A generator of DataFrames with at most chunksize rows each.
+        :rtype: Iterator[pd.DataFrame]
+
+        Example usage:
+        ```python
+        for chunk in db.iter_table_df("employees", "name", "age", chunksize=50000, city = "Wrocław"):
+            print(chunk["age"].mean())
+        ```
+        """
+        column_string = ", ".join(column_names) if column_names else "*"
+        where_clause, params = build_conditions(condition_operator, **kwargs)
+        query = f"SELECT {column_string} FROM '{table_name}' {where_clause}"
+        yield from pd.read_sql_query(query, self.conn, params=params, chunksize=chunksize)
+
+    def get_row_count(self, table_name: str):
+        """
+        Retrieves the number of rows in the specified table.
+
+        :param table_name: The name of the table.
+        :type table_name: str
+        :return: The number of rows.
+        :rtype: int
+        """
+        self.cur.execute(f"SELECT COUNT(*) FROM '{table_name}'")
+        return self.cur.fetchone()[0]
+
+    def get_column(self, table_name: str, column_name: str):
+        """
+        Retrieves all values of a column of the specified table, in rowid order.
+
+        :param table_name: The name of the table.
+        :type table_name: str
+        :param column_name: The name of the column.
+        :type column_name: str
+        :return: A list of the column values.
+        :rtype: list
+        """
+        self.cur.execute(f"SELECT {column_name} FROM '{table_name}' ORDER BY rowid")
+        return [row[0] for row in self.cur.fetchall()]
+
+    def get_row_by_id(self, table_name: str, id_value: int):
+        """
+        Retrieves a row of the specified table by its ID.
+
+        :param table_name: The name of the table.
+        :type table_name: str
+        :param id_value: The ID of the row.
+        :type id_value: int
+        :return: The row, or None if there is no row with this ID.
+        :rtype: tuple
+        """
+        self.cur.execute(f"SELECT * FROM '{table_name}' WHERE id = ?", (id_value,))
+        return self.cur.fetchone()
+
+    def check_value_in_column(self, table_name: str, column_name: str, value):
+        """
+        Checks if a value exists in a column of the specified table.
+
+        :param table_name: The name of the table.
+        :type table_name: str
+        :param column_name: The name of the column.
+        :type column_name: str
+        :param value: The value to look for.
+        :return: True if at least one row has this value, False otherwise.
+        :rtype: bool
+        """
+        self.cur.execute(f"SELECT 1 FROM '{table_name}' WHERE {column_name} = ? LIMIT 1", (value,))
+        return self.cur.fetchone() is not None
+
+    def delete_row(self, table_name: str, condition_column: str, condition_value):
+        """
+        Deletes all rows of the specified table where a column equals a value.
+
+        :param table_name: The name of the table.
+        :type table_name: str
+        :param condition_column: The name of the column to compare.
+        :type condition_column: str
+        :param condition_value: The value of the rows to delete.
+        :return: None
+        :rtype: None
+        """
+        self.cur.execute(f"DELETE FROM '{table_name}' WHERE {condition_column} = ?", (condition_value,))
+        self.conn.commit()
         
     def insert_row(self, table_name: str, *values):
         """
@@ -441,7 +631,7 @@ class Database:
 
         :param table_name: The name of the table to retrieve the last ID from.
         :type table_name: str
-        :return: The last inserted ID in the specified table.
+        :return: The last inserted ID in the specified table (None if the table is empty).
         :rtype: int
 
         Example usage:
@@ -451,8 +641,8 @@ class Database:
         print("Last inserted ID in 'employees' table:", last_id)
         ```
         """        
-        self.cur.execute(f"SELECT id FROM {table_name}")
-        last_id = self.cur.fetchall()[-1][0]
+        self.cur.execute(f"SELECT MAX(id) FROM {table_name}")
+        last_id = self.cur.fetchone()[0]
         return last_id  
 
     def update_data(self, table_name: str, attribute_name: str, attribute_value: str, item_id: int):
@@ -476,7 +666,7 @@ class Database:
         db.update_data("employees", "age", "35", 1)
         ```
         """
-        self.cur.execute(f"UPDATE {table_name} set {attribute_name} = {attribute_value} where id = {item_id}")
+        self.cur.execute(f"UPDATE {table_name} set {attribute_name} = ? where id = ?", (attribute_value, item_id))
         self.conn.commit()
 
     def update_table(self, table_name: str, update_dict, where_dict):
@@ -528,9 +718,15 @@ def download_proxies_from_file(db, file_url):
 
 
 
-def main():
+def main(database_name: str="web_scraper_data_base", file_url: str="proxy_list.txt"):
+    """
+    Recreate the proxy tables and import the proxies of a file (see also 'python cli.py proxies import').
 
-    db = Database("web_scraper_data_base")
+    Args:
+    database_name (str, optional): The database name.
+    file_url (str, optional): The proxy file, one proxy per line.
+    """
+    db = Database(database_name)
 
     if db.check_table_exists("proxies_unchecked"):
          db.drop_table("proxies_unchecked")
@@ -544,8 +740,6 @@ def main():
         db.drop_table("proxies_not_working")
     db.create_table("proxies_not_working", "id INTEGER PRIMARY KEY AUTOINCREMENT", "ip_address")
 
-    file_url = "proxy_list.txt"
-
     download_proxies_from_file(db, file_url)
 
 if __name__ == '__main__':
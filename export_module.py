@@ -0,0 +1,253 @@
+import csv
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+CSV_COLUMNS = ["titles","prices","location","area","price per square meter","numbers_of_rooms","urls","property_ownership","condition_of_property","floor","balcon_garden_terrace","amount_of_rent","parking_space","type_of_heating","primary_secondary","seller","year_of_construction","type_of_development","window","lift","utilities","security","home_furnishings","additional_info","bulding_material", "describe"]
+
+# Columns stored as float64 instead of raw strings.
+NUMERIC_COLUMNS = ["prices", "area", "price per square meter"]
+INTEGER_COLUMNS = ["numbers_of_rooms"]
+# Columns with a small set of repeated values, stored dictionary encoded.
+CATEGORICAL_COLUMNS = ["property_ownership", "condition_of_property", "floor", "balcon_garden_terrace", "parking_space", "type_of_heating", "primary_secondary", "seller", "type_of_development", "window", "lift", "bulding_material"]
+
+MISSING_VALUES = {"", "brak informacji", "Zapytajocenę"}
+
+OUTPUT_FORMATS = {"csv": "", "parquet": ".parquet", "arrow": ".arrows"}
+# Codecs supported by each format, None = uncompressed. Arrow IPC only supports lz4 and zstd.
+FORMAT_COMPRESSIONS = {"parquet": ["zstd", "snappy", "gzip", "lz4", None], "arrow": ["zstd", "lz4", None]}
+
+
+def parse_number(value):
+    """
+    Convert a scraped numeric string (e.g. "650000", "48,5", "12 345") to float.
+
+    Args:
+    value (str): The raw value scraped from the page.
+
+    Returns:
+    float: The parsed number, or None if the value is missing or not a number.
+    """
+    if value is None:
+        return None
+    value = str(value).replace("\xa0", "").replace(" ", "").replace(",", ".")
+    if value in MISSING_VALUES:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_integer(value):
+    """
+    Convert a scraped integer string (e.g. "3") to int.
+
+    Args:
+    value (str): The raw value scraped from the page.
+
+    Returns:
+    int: The parsed number, or None if the value is missing or not an integer (e.g. "więcej niż 10").
+    """
+    number = parse_number(value)
+    if number is None or not number.is_integer():
+        return None
+    return int(number)
+
+
+def parse_text(value):
+    """
+    Normalize a scraped text value, mapping placeholders like "brak informacji" to None.
+
+    Args:
+    value (str): The raw value scraped from the page.
+
+    Returns:
+    str: The value, or None if it is a missing value placeholder.
+    """
+    if value is None:
+        return None
+    value = str(value)
+    return None if value in MISSING_VALUES else value
+
+
+def get_arrow_schema():
+    """
+    Build the typed Arrow schema used by the Parquet and Arrow IPC sinks.
+
+    Returns:
+    pyarrow.Schema: Schema with one field per CSV column.
+    """
+    fields = []
+    for column in CSV_COLUMNS:
+        if column in NUMERIC_COLUMNS:
+            fields.append(pa.field(column, pa.float64()))
+        elif column in INTEGER_COLUMNS:
+            fields.append(pa.field(column, pa.int32()))
+        elif column in CATEGORICAL_COLUMNS:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+class CsvSink:
+    """
+    Output sink writing scraped rows as raw strings to a CSV file.
+
+    The header is written on creation and every row is flushed immediately, so a crashed
+    run keeps all the offers scraped so far.
+    """
+
+    def __init__(self, file_url: str):
+        self.file_url = file_url
+        self.file = open(file_url, 'w', newline='', encoding="utf-8")
+        self.csv_writer = csv.writer(self.file)
+        self.csv_writer.writerow(CSV_COLUMNS)
+        self.file.flush()
+
+    def write_row(self, row):
+        """
+        Write a single scraped row.
+
+        Args:
+        row (list): Values in CSV_COLUMNS order.
+        """
+        self.csv_writer.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ArrowSink:
+    """
+    Output sink writing scraped rows as typed, compressed Parquet or Arrow IPC.
+
+    Rows are buffered and written as one row group (Parquet) or record batch (Arrow) every
+    'row_group_size' rows. Prices and areas are stored as float64, the number of rooms as int32
+    and repeated values (heating, ownership, condition, ...) dictionary encoded.
+    """
+
+    def __init__(self, file_url: str, output_format: str="parquet", row_group_size: int=5000, compression: str="zstd"):
+        if pa is None:
+            raise ImportError("pyarrow is required for the parquet and arrow output formats")
+        if output_format not in ("parquet", "arrow"):
+            raise ValueError("output_format must be 'parquet' or 'arrow'")
+        if compression not in FORMAT_COMPRESSIONS[output_format]:
+            raise ValueError(f"{output_format} doesn't support {compression} compression, use one of {FORMAT_COMPRESSIONS[output_format]}")
+        self.file_url = file_url
+        self.output_format = output_format
+        self.row_group_size = row_group_size
+        self.schema = get_arrow_schema()
+        self.rows = []
+        if output_format == "parquet":
+            self.writer = pq.ParquetWriter(file_url, self.schema, compression=compression)
+        else:
+            # Stream format, so each batch may carry its own dictionaries.
+            options = pa.ipc.IpcWriteOptions(compression=compression)
+            self.writer = pa.ipc.new_stream(file_url, self.schema, options=options)
+
+    def write_row(self, row):
+        """
+        Buffer a single scraped row, writing a row group once the buffer is full.
+
+        Args:
+        row (list): Values in CSV_COLUMNS order.
+        """
+        self.rows.append(row)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write buffered rows as one row group / record batch.
+        """
+        if not self.rows:
+            return
+        arrays = []
+        for index, field in enumerate(self.schema):
+            values = [row[index] for row in self.rows]
+            if field.name in NUMERIC_COLUMNS:
+                arrays.append(pa.array([parse_number(value) for value in values], type=pa.float64()))
+            elif field.name in INTEGER_COLUMNS:
+                arrays.append(pa.array([parse_integer(value) for value in values], type=pa.int32()))
+            elif field.name in CATEGORICAL_COLUMNS:
+                arrays.append(pa.array([parse_text(value) for value in values], type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array([parse_text(value) for value in values], type=pa.string()))
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if self.output_format == "parquet":
+            self.writer.write_batch(batch, row_group_size=self.row_group_size)
+        else:
+            self.writer.write_batch(batch)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def make_sink(file_url: str, output_format: str="csv", **kwargs):
+    """
+    Create an output sink for scraped rows.
+
+    Args:
+    file_url (str): Output file name without extension.
+    output_format (str): One of "csv", "parquet" or "arrow".
+    **kwargs: Passed to ArrowSink (row_group_size, compression).
+
+    Returns:
+    CsvSink or ArrowSink: An opened sink with write_row() and close() methods.
+
+    Raises:
+    ValueError: If the output format is unknown.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {list(OUTPUT_FORMATS)}")
+    file_url += OUTPUT_FORMATS[output_format]
+    if output_format == "csv":
+        return CsvSink(file_url)
+    return ArrowSink(file_url, output_format, **kwargs)
+
+
+def convert_csv(csv_url: str, output_format: str="parquet", **kwargs):
+    """
+    Convert an existing scraper CSV file to a typed Parquet or Arrow IPC file.
+
+    Args:
+    csv_url (str): Path of the CSV file written by web_scraper.main.
+    output_format (str): "parquet" or "arrow".
+    **kwargs: Passed to ArrowSink (row_group_size, compression).
+
+    Returns:
+    str: Path of the written file.
+    """
+    base_url, extension = os.path.splitext(csv_url)
+    if extension != ".csv":
+        base_url = csv_url
+    with open(csv_url, 'r', newline='', encoding="utf-8") as file:
+        csv_reader = csv.reader(file)
+        next(csv_reader, None)
+        with make_sink(base_url, output_format, **kwargs) as sink:
+            for row in csv_reader:
+                sink.write_row(row)
+    return sink.file_url
@@ -0,0 +1,146 @@
+import random
+
+# Headers sent by each browser family alongside its User-Agent, so a profile never mixes
+# e.g. a Firefox User-Agent with Chrome's Accept header.
+BROWSER_HEADERS = {
+    "chrome": {'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+               'Accept-Language': 'pl-PL,pl;q=0.9,en-US;q=0.8,en;q=0.7',
+               'Accept-Encoding': 'gzip, deflate, br'},
+    "firefox": {'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+                'Accept-Language': 'pl,en-US;q=0.7,en;q=0.3',
+                'Accept-Encoding': 'gzip, deflate, br'},
+    "safari": {'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+               'Accept-Language': 'pl-PL,pl;q=0.9',
+               'Accept-Encoding': 'gzip, deflate, br'},
+}
+
+
+def detect_browser(user_agent: str):
+    """
+    Detect the browser family of a User-Agent string.
+
+    Args:
+    user_agent (str): The User-Agent header value.
+
+    Returns:
+    str: "firefox", "chrome" (also Edge and other Chromium browsers) or "safari".
+    """
+    if "Firefox/" in user_agent:
+        return "firefox"
+    if "Chrome/" in user_agent:
+        return "chrome"
+    return "safari"
+
+
+class HeaderProfile:
+    """
+    A precomputed, internally consistent set of request headers (User-Agent, Accept,
+    Accept-Language, Accept-Encoding) together with its request statistics.
+    """
+
+    def __init__(self, user_agent: str, accept_encoding: str=None):
+        self.user_agent = user_agent
+        self.browser = detect_browser(user_agent)
+        self.headers = dict(BROWSER_HEADERS[self.browser], **{'User-Agent': user_agent})
+        if accept_encoding is not None:
+            self.headers['Accept-Encoding'] = accept_encoding
+        self.successes = 0
+        self.failures = 0
+        self.retired = False
+
+    @property
+    def requests(self):
+        return self.successes + self.failures
+
+    @property
+    def success_rate(self):
+        return self.successes / self.requests if self.requests else 1.0
+
+    def __repr__(self):
+        return f"HeaderProfile({self.user_agent!r}, success_rate={self.success_rate:.2f}, requests={self.requests}, retired={self.retired})"
+
+
+class FingerprintEngine:
+    """
+    Assigns header profiles to proxies and retires profiles which get blocked more often than others.
+
+    Every proxy is pinned to one profile and one referer for the lifetime of the session, so an IP
+    address always presents the same browser. After 'min_requests' requests a profile whose success
+    rate falls below 'retire_ratio' times the average success rate of the active profiles is retired
+    and its proxies are pinned to other profiles. Comparing with the average keeps generally bad
+    proxies from retiring every profile. 'accept_encoding' overrides the browser's Accept-Encoding,
+    e.g. to not advertise brotli when it can't be decoded.
+    """
+
+    def __init__(self, user_agents, referers, min_requests: int=20, retire_ratio: float=0.5, min_active: int=2, accept_encoding: str=None):
+        self.profiles = [HeaderProfile(user_agent, accept_encoding) for user_agent in dict.fromkeys(user_agents)]
+        self.referers = list(referers)
+        self.min_requests = min_requests
+        self.retire_ratio = retire_ratio
+        self.min_active = min_active
+        self.pinned = {}
+
+    def active_profiles(self):
+        return [profile for profile in self.profiles if not profile.retired]
+
+    def pin(self, proxy: str):
+        """
+        Pin a random active profile and referer to a proxy.
+
+        Args:
+        proxy (str): The proxy address.
+
+        Returns:
+        tuple: The pinned (HeaderProfile, referer).
+        """
+        self.pinned[proxy] = (random.choice(self.active_profiles()), random.choice(self.referers))
+        return self.pinned[proxy]
+
+    def headers_for(self, proxy: str):
+        """
+        Get the request headers for a proxy, pinning a profile on first use.
+
+        Args:
+        proxy (str): The proxy address.
+
+        Returns:
+        dict: The request headers.
+        """
+        profile, referer = self.pinned.get(proxy) or self.pin(proxy)
+        if profile.retired:
+            profile, referer = self.pin(proxy)
+        return dict(profile.headers, Referer=referer)
+
+    def report(self, proxy: str, success: bool):
+        """
+        Record the outcome of a request made with the profile pinned to a proxy.
+
+        Args:
+        proxy (str): The proxy address used for the request.
+        success (bool): Whether the response was valid (not blocked).
+        """
+        if proxy not in self.pinned:
+            return
+        profile = self.pinned[proxy][0]
+        if success:
+            profile.successes += 1
+        else:
+            profile.failures += 1
+        self.retire_bad_profiles()
+
+    def retire_bad_profiles(self):
+        """
+        Retire active profiles performing much worse than the average, keeping at least 'min_active' profiles.
+        """
+        active = self.active_profiles()
+        measured = [profile for profile in active if profile.requests >= self.min_requests]
+        if not measured:
+            return
+        average_rate = sum(profile.success_rate for profile in measured) / len(measured)
+        for profile in sorted(measured, key=lambda profile: profile.success_rate):
+            if len(active) <= self.min_active:
+                break
+            if profile.success_rate < self.retire_ratio * average_rate:
+                profile.retired = True
+                active.remove(profile)
+                print("RETIRED HEADER PROFILE: " + repr(profile))
@@ -0,0 +1,203 @@
+import json
+import re
+from datetime import datetime
+from urllib.parse import urlsplit
+
+OFFERS_TABLE = "offers"
+HISTORY_TABLE = "offer_history"
+# otodom offer urls end with "-ID<id>", e.g. /pl/oferta/mieszkanie-3-pokojowe-ID4mXyZ
+OFFER_ID_REGEX = re.compile(r"-(ID[0-9A-Za-z]+)(?:$|[/?#.])")
+UNTRACKED_FIELDS = ["urls"]
+
+
+def parse_offer_id(href: str):
+    """
+    Parses the otodom offer ID from an offer url or href.
+
+    :param href: The offer url, absolute or relative (offer['href']).
+    :type href: str
+    :return: The offer ID (e.g. "ID4mXyZ"), or the last path segment if the url has no ID.
+    :rtype: str
+
+    Example usage:
+    ```python
+    parse_offer_id("/pl/oferta/mieszkanie-3-pokojowe-ID4mXyZ")  # "ID4mXyZ"
+    ```
+    """
+    path = urlsplit(href).path.rstrip("/")
+    match = OFFER_ID_REGEX.search(path)
+    if match is not None:
+        return match.group(1)
+    return path.rsplit("/", 1)[-1]
+
+
+class OfferStore:
+    """
+    A store of scraped offers keyed by the otodom offer ID, with an append-only attribute history.
+
+    Only the current snapshot of every offer is kept in the 'offers' table. Each change of a field
+    (including the first time it was seen) is appended to 'offer_history' as one
+    (offer_id, date, field, value, previous_value) row, so unchanged offers cost nothing per crawl.
+
+    Attributes:
+    - db (db_module.Database): The database holding the store tables.
+    - commit_every (int): The number of recorded offers after which the transaction is committed.
+
+    Methods:
+    - record(self, offer_id: str, url: str, attributes: dict, date: str = None): Records a scraped offer.
+    - is_known(self, offer_id: str): Checks if an offer has been recorded before.
+    - get_offer(self, offer_id: str): Retrieves the current snapshot of an offer.
+    - price_history(self, offer_id: str): Retrieves the price history of an offer.
+    - price_drops(self, since_date: str, until_date: str = None): Retrieves offers whose price dropped in a date range.
+    - compact(self, before_date: str): Collapses the history older than a date into one snapshot per field.
+    - flush(self): Commits pending changes.
+    """
+
+    def __init__(self, db, commit_every: int=50):
+        """
+        Initializes the store and creates its tables and indexes if they don't exist.
+
+        :param db: The database holding the store tables.
+        :type db: db_module.Database
+        :param commit_every: The number of recorded offers after which the transaction is committed.
+        :type commit_every: int
+        """
+        self.db = db
+        self.commit_every = commit_every
+        self.pending = 0
+        if not db.check_table_exists(OFFERS_TABLE):
+            db.create_table(OFFERS_TABLE, "offer_id TEXT PRIMARY KEY", "url TEXT", "first_seen TEXT", "last_seen TEXT", "snapshot TEXT")
+        if not db.check_table_exists(HISTORY_TABLE):
+            db.create_table(HISTORY_TABLE, "id INTEGER PRIMARY KEY AUTOINCREMENT", "offer_id TEXT", "date TEXT", "field TEXT", "value TEXT", "previous_value TEXT")
+        db.cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{HISTORY_TABLE}_offer_date ON {HISTORY_TABLE} (offer_id, date)")
+        db.cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{HISTORY_TABLE}_field_date ON {HISTORY_TABLE} (field, date)")
+        db.conn.commit()
+
+    def record(self, offer_id: str, url: str, attributes: dict, date: str=None):
+        """
+        Records a scraped offer, appending only the fields which changed since the last snapshot.
+
+        :param offer_id: The otodom offer ID (see parse_offer_id).
+        :type offer_id: str
+        :param url: The offer url.
+        :type url: str
+        :param attributes: The scraped field values, e.g. dict(zip(export_module.CSV_COLUMNS, row)).
+        :type attributes: dict
+        :param date: The crawl date in ISO format. Defaults to today.
+        :type date: str
+        :return: The names of the changed fields (all fields for a new offer).
+        :rtype: list
+        """
+        date = date or datetime.today().strftime('%Y-%m-%d')
+        attributes = {field: (None if value is None else str(value)) for field, value in attributes.items() if field not in UNTRACKED_FIELDS}
+
+        self.db.cur.execute(f"SELECT snapshot FROM {OFFERS_TABLE} WHERE offer_id = ?", (offer_id,))
+        result = self.db.cur.fetchone()
+        if result is None:
+            snapshot = {}
+            self.db.cur.execute(f"INSERT INTO {OFFERS_TABLE} VALUES(?, ?, ?, ?, ?)", (offer_id, url, date, date, json.dumps(attributes, ensure_ascii=False)))
+        else:
+            snapshot = json.loads(result[0])
+            snapshot_update = dict(snapshot, **attributes)
+            self.db.cur.execute(f"UPDATE {OFFERS_TABLE} SET url = ?, last_seen = ?, snapshot = ? WHERE offer_id = ?",
+                                (url, date, json.dumps(snapshot_update, ensure_ascii=False), offer_id))
+
+        changes = [(offer_id, date, field, value, snapshot.get(field)) for field, value in attributes.items()
+                   if field not in snapshot or snapshot[field] != value]
+        self.db.cur.executemany(f"INSERT INTO {HISTORY_TABLE} (offer_id, date, field, value, previous_value) VALUES(?, ?, ?, ?, ?)", changes)
+
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.flush()
+        return [change[2] for change in changes]
+
+    def is_known(self, offer_id: str):
+        """
+        Checks if an offer has been recorded in any previous crawl.
+
+        :param offer_id: The otodom offer ID.
+        :type offer_id: str
+        :return: True if the offer is in the store, False otherwise.
+        :rtype: bool
+        """
+        self.db.cur.execute(f"SELECT 1 FROM {OFFERS_TABLE} WHERE offer_id = ?", (offer_id,))
+        return self.db.cur.fetchone() is not None
+
+    def get_offer(self, offer_id: str):
+        """
+        Retrieves the current snapshot of an offer.
+
+        :param offer_id: The otodom offer ID.
+        :type offer_id: str
+        :return: A dictionary with url, first_seen, last_seen and the latest field values, or None if unknown.
+        :rtype: dict
+        """
+        self.db.cur.execute(f"SELECT url, first_seen, last_seen, snapshot FROM {OFFERS_TABLE} WHERE offer_id = ?", (offer_id,))
+        result = self.db.cur.fetchone()
+        if result is None:
+            return None
+        url, first_seen, last_seen, snapshot = result
+        return dict(json.loads(snapshot), urls=url, first_seen=first_seen, last_seen=last_seen)
+
+    def price_history(self, offer_id: str):
+        """
+        Retrieves the price history of an offer using the (offer_id, date) index.
+
+        :param offer_id: The otodom offer ID.
+        :type offer_id: str
+        :return: A list of (date, price) tuples, one per price change.
+        :rtype: list
+        """
+        self.db.cur.execute(f"SELECT date, value FROM {HISTORY_TABLE} WHERE offer_id = ? AND field = 'prices' ORDER BY date, id", (offer_id,))
+        return self.db.cur.fetchall()
+
+    def price_drops(self, since_date: str, until_date: str=None):
+        """
+        Retrieves offers whose price dropped in a date range using the (field, date) index.
+
+        :param since_date: The first date (yyyy-mm-dd) of the range.
+        :type since_date: str
+        :param until_date: The last date (yyyy-mm-dd) of the range. Defaults to no limit.
+        :type until_date: str
+        :return: A list of (offer_id, date, previous_price, price) tuples.
+        :rtype: list
+
+        Example usage:
+        ```python
+        # All offers whose price dropped this week
+        monday = (datetime.today() - timedelta(days=datetime.today().weekday())).strftime('%Y-%m-%d')
+        drops = store.price_drops(monday)
+        ```
+        """
+        self.db.cur.execute(f"""SELECT offer_id, date, previous_value, value FROM {HISTORY_TABLE}
+                                WHERE field = 'prices' AND date >= ? AND date <= ?
+                                AND CAST(value AS REAL) > 0 AND CAST(value AS REAL) < CAST(previous_value AS REAL)
+                                ORDER BY date, offer_id""", (since_date, until_date or "9999-99-99"))
+        return self.db.cur.fetchall()
+
+    def compact(self, before_date: str):
+        """
+        Collapses the history older than a date into a single baseline row per offer and field.
+
+        The latest value of every field before 'before_date' is kept, all older changes are deleted.
+
+        :param before_date: History rows dated before this date (yyyy-mm-dd) are compacted.
+        :type before_date: str
+        :return: The number of deleted history rows.
+        :rtype: int
+        """
+        self.flush()
+        self.db.cur.execute(f"""DELETE FROM {HISTORY_TABLE} WHERE date < ? AND id NOT IN
+                                (SELECT MAX(id) FROM {HISTORY_TABLE} WHERE date < ? GROUP BY offer_id, field)""", (before_date, before_date))
+        deleted = self.db.cur.rowcount
+        self.db.cur.execute(f"UPDATE {HISTORY_TABLE} SET previous_value = NULL WHERE date < ?", (before_date,))
+        self.db.conn.commit()
+        print(f"Compacted {HISTORY_TABLE}: {deleted} rows deleted.")
+        return deleted
+
+    def flush(self):
+        """
+        Commits the recorded offers.
+        """
+        self.db.conn.commit()
+        self.pending = 0
@@ -0,0 +1,698 @@
+import argparse
+import glob
+import hashlib
+import html
+import json
+import os
+import os.path
+import re
+import sys
+from bs4 import BeautifulSoup
+import export_module
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# CSS selectors of every offer page field, tried in order. The first one is the presentation class
+# used so far, which otodom changes often; the next ones rely on more stable data-cy / aria attributes.
+OFFER_SELECTORS = {
+    "title": ['.css-1wnihf5.efcnut38', '[data-cy="adPageAdTitle"]', 'h1'],
+    "price": ['.css-t3wmkv.e1l1avn10', '[data-cy="adPageHeaderPrice"]'],
+    "price_per_m2": ['.css-1h1l5lm.efcnut39', '[aria-label="Cena za metr kwadratowy"]'],
+    "location": ['.css-z9gx1y.e3ustps0', '[aria-label="Adres"]'],
+    "details": ['.enb64yk1'],
+    "describe": ['.e175i4j93', '[data-cy="adPageAdDescription"]'],
+}
+# Offer links of a search result page, tried in order
+LISTING_OFFER_SELECTORS = ['a.css-1hfdwlm.e1dfeild2', 'a[data-cy="listing-item-link"]', 'a[href*="/pl/oferta/"]']
+# Offer cards of a search result page and their title / location, tried in order (see extract_listing_summaries)
+LISTING_CARD_SELECTORS = ['article[data-cy="listing-item"]', 'li[data-cy="listing-item"]', '[data-cy="listing-item"]']
+LISTING_CARD_TITLE_SELECTORS = ['[data-cy="listing-item-title"]', 'h3', 'h2']
+LISTING_CARD_LOCATION_SELECTORS = ['[data-testid="advert-card-address"]', 'address']
+# The numbers of a card are matched on its texts, which are more stable than its classes
+CARD_PRICE_REGEX = re.compile(r"^([\d ]+(?:[.,]\d+)?) ?zł$")
+CARD_PRICE_PER_M2_REGEX = re.compile(r"^([\d ]+(?:[.,]\d+)?) ?zł/m²$")
+CARD_AREA_REGEX = re.compile(r"^(\d[\d ]*(?:[.,]\d+)?) ?m²$")
+CARD_ROOMS_REGEX = re.compile(r"^(\d+)\+? ?pok")
+# Columns a listing card (or the listing's embedded JSON) provides
+SUMMARY_COLUMNS = ["titles", "prices", "location", "area", "price per square meter", "numbers_of_rooms"]
+# Summary columns recorded in the offer store. The other ones differ in form from the offer page
+# (e.g. the short card address) and would log changes which didn't happen.
+SUMMARY_RECORDED_COLUMNS = ["prices"]
+# Columns of a summary row taken from the stored offer when it has them, as the card shows a shorter value
+SUMMARY_SNAPSHOT_COLUMNS = ["location"]
+# roomsNumber values of the embedded JSON
+ROOMS_NUMBERS = {"ONE": "1", "TWO": "2", "THREE": "3", "FOUR": "4", "FIVE": "5", "SIX": "6", "SEVEN": "7", "EIGHT": "8", "NINE": "9", "TEN": "10", "MORE": "10"}
+# The Next.js state script of otodom pages, found with a byte-level search (see find_next_data)
+NEXT_DATA_MARKER = b'id="__NEXT_DATA__"'
+NEXT_DATA_END = b"</script>"
+# The page can be downloaded up to the end of that script (see web_scraper.read_body), the page content comes before it
+NEXT_DATA_STOP_MARKERS = (NEXT_DATA_MARKER, NEXT_DATA_END)
+# CSV column -> keys of the offer's "characteristics" in the embedded JSON, tried in order
+AD_CHARACTERISTICS = {
+    "prices": ["price"],
+    "area": ["m"],
+    "price per square meter": ["price_per_m"],
+    "numbers_of_rooms": ["rooms_num"],
+    "property_ownership": ["building_ownership"],
+    "condition_of_property": ["construction_status"],
+    "floor": ["floor_no"],
+    "balcon_garden_terrace": ["outdoor"],
+    "amount_of_rent": ["rent"],
+    "parking_space": ["car"],
+    "type_of_heating": ["heating"],
+    "primary_secondary": ["market"],
+    "seller": ["advertiser_type"],
+    "year_of_construction": ["build_year"],
+    "type_of_development": ["building_type"],
+    "window": ["windows_type"],
+    "lift": ["lift"],
+    "utilities": ["media_types"],
+    "security": ["security_types"],
+    "home_furnishings": ["equipment_types"],
+    "additional_info": ["extras_types"],
+    "bulding_material": ["building_material"],
+}
+# Columns taken from the raw characteristic value instead of the displayed one ("552000", not "552 000 zł"),
+# formatted like 'build_offer_row' writes them (see format_integer / format_decimal)
+AD_RAW_VALUE_COLUMNS = ["prices", "area", "price per square meter", "numbers_of_rooms"]
+# Offer pages show areas with at most two decimals (see format_decimal)
+DECIMAL_PLACES = 2
+ADVERTISER_TYPES = {"private": "prywatny", "agency": "biuro nieruchomości", "developer": "deweloper"}
+HTML_TAG_REGEX = re.compile(r"<[^>]+>")
+# Fields without which an offer can't be written (see build_offer_row)
+REQUIRED_FIELDS = ["title", "price", "price_per_m2", "details"]
+# The details table alternates labels and values, at least 10 values are read
+MIN_DETAILS = 20
+
+
+class SelectorDriftError(Exception):
+    """
+    Raised when the selectors stop matching the offer pages (otodom changed its markup).
+    """
+
+
+def extract_offer_links(bs):
+    """
+    Extract the offer links of a search result page, using the first selector which matches.
+
+    Args:
+    bs (bs4.BeautifulSoup): The parsed search result page.
+
+    Returns:
+    list: Unique offer hrefs (e.g. "/pl/oferta/..."), in page order.
+    """
+    for selector in LISTING_OFFER_SELECTORS:
+        hrefs = [offer['href'] for offer in bs.select(selector) if offer.get('href')]
+        if hrefs:
+            return list(dict.fromkeys(hrefs))
+    return []
+
+
+def extract_offer_fields(bs_offer):
+    """
+    Extract the raw text of every offer field from a parsed offer page.
+
+    Args:
+    bs_offer (bs4.BeautifulSoup): The parsed offer page.
+
+    Returns:
+    dict: Field name -> raw text (a list of texts for "details"), None if no selector matched.
+    """
+    fields = {}
+    for field, selectors in OFFER_SELECTORS.items():
+        fields[field] = None
+        for selector in selectors:
+            if field == "details":
+                elements = bs_offer.select(selector)
+                if len(elements) >= MIN_DETAILS:
+                    fields[field] = [element.get_text() for element in elements]
+                    break
+            else:
+                element = bs_offer.select_one(selector)
+                if element is not None:
+                    fields[field] = element.get_text()
+                    break
+    return fields
+
+
+def build_offer_row(fields, offer_url):
+    """
+    Build the CSV row of an offer from its extracted fields.
+
+    Args:
+    fields (dict): Fields returned by 'extract_offer_fields'.
+    offer_url (str): The offer URL.
+
+    Returns:
+    list: The row in export_module.CSV_COLUMNS order, or None if the offer has no price.
+
+    Raises:
+    ValueError: If a required field is missing.
+    """
+    missing_fields = [field for field in REQUIRED_FIELDS if fields.get(field) is None]
+    if missing_fields:
+        raise ValueError("Missing fields: " + ", ".join(missing_fields))
+
+    title = fields["title"]
+    price = fields["price"].replace("\xa0","").replace("zł","").replace(" ","")
+    price_per_squered_meter = fields["price_per_m2"].replace("\xa0","").replace("zł/m²","").replace(" ","")
+
+    if price == "Zapytajocenę" and price_per_squered_meter == "":
+        print("Brak ceny, oferta zostanie pominięta")
+        return None
+
+    location = fields["location"]
+    if location is not None:
+        location = location.replace("\xa0","").replace("zł/m²","")
+
+    information_list = fields["details"][1::2]
+    apartment_area = information_list[0].replace(" m²","").replace("\xa0","")
+    number_of_rooms = information_list[2].replace(" ","")
+    property_ownership = information_list[1]
+    condition_of_property = information_list[3]
+    floor = information_list[4]
+    balcon_garden_terrace = information_list[5]
+    amount_of_rent = information_list[6]
+    parking_space = information_list[7]
+    type_of_heating = information_list[9]
+
+    if len(information_list) == 22:
+        primary_secondary = information_list[10]
+        seller = information_list[11]
+        year_of_construction = information_list[13]
+        type_of_development = information_list[14]
+        window = information_list[15]
+        lift = information_list[16]
+        utilities = information_list[17]
+        security = information_list[18]
+        home_furnishings = information_list[19]
+        additional_info = information_list[20]
+        bulding_material = information_list[21]
+    else:
+        primary_secondary = "brak informacji"
+        seller = "brak informacji"
+        year_of_construction = "brak informacji"
+        type_of_development = "brak informacji"
+        window = "brak informacji"
+        lift = "brak informacji"
+        utilities = "brak informacji"
+        security = "brak informacji"
+        home_furnishings = "brak informacji"
+        additional_info = "brak informacji"
+        bulding_material = "brak informacji"
+
+    describe = fields["describe"]
+    if describe is not None:
+        describe = describe.replace("\n"," ").replace("\xa0","").replace("\r"," ").replace("'"," ").replace('"',' ')
+    else:
+        describe = ""
+
+    return [title, price, location, apartment_area, price_per_squered_meter, number_of_rooms, offer_url, property_ownership, condition_of_property, floor, balcon_garden_terrace, amount_of_rent, parking_space, type_of_heating, primary_secondary, seller, year_of_construction, type_of_development, window, lift, utilities, security, home_furnishings, additional_info, bulding_material, describe]
+
+
+def format_integer(value):
+    """
+    Format a number (from the embedded JSON or a card) like the integers scraped from the offer page:
+    552000.0 -> "552000", "10128.44" -> "10128".
+    """
+    number = export_module.parse_number(value)
+    if number is None:
+        return None if value is None else str(value)
+    return str(int(round(number)))
+
+
+def format_decimal(value):
+    """
+    Format a number (from the embedded JSON or a card) like the decimals scraped from the offer page,
+    with a decimal comma and at most DECIMAL_PLACES decimals: 54.5 -> "54,5", 54.0 -> "54", 0.1 + 0.2 -> "0,3".
+    """
+    number = export_module.parse_number(value)
+    if number is None:
+        return None if value is None else str(value)
+    text = f"{number:.{DECIMAL_PLACES}f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text.replace(".", ",")
+
+
+def decode_json(data: bytes):
+    """
+    Decode JSON with orjson if it is installed, else with the json module.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def find_next_data(body: bytes):
+    """
+    Find and decode the Next.js state embedded in a page (the __NEXT_DATA__ script) without parsing the HTML.
+
+    Args:
+    body (bytes): The page body (response.content).
+
+    Returns:
+    dict: The decoded state, or None if the page has none or it is not valid JSON.
+    """
+    marker = body.find(NEXT_DATA_MARKER)
+    if marker == -1:
+        return None
+    start = body.find(b">", marker) + 1
+    end = body.find(NEXT_DATA_END, start)
+    if start == 0 or end == -1:
+        return None
+    try:
+        return decode_json(body[start:end])
+    except ValueError:
+        return None
+
+
+def get_page_count(next_data):
+    """
+    Get the number of search result pages from the embedded state of a search result page.
+
+    Args:
+    next_data (dict): The state returned by 'find_next_data'.
+
+    Returns:
+    int: The number of pages, or None if the state has no pagination.
+    """
+    try:
+        return int(next_data["props"]["pageProps"]["data"]["searchAds"]["pagination"]["totalPages"])
+    except (TypeError, KeyError, ValueError):
+        return None
+
+
+def format_location(location):
+    """
+    Format the "location" object of the embedded JSON like the address shown on the page,
+    e.g. "ul. Długa 5, Krzyki, Wrocław, dolnośląskie".
+    """
+    location = location or {}
+    address = location.get("address") or {}
+    street = address.get("street") or {}
+    locations = (location.get("reverseGeocoding") or {}).get("locations") or []
+    location_text = None
+    if locations:
+        # fullName of the most specific location, e.g. "Krzyki, Wrocław, dolnośląskie"
+        location_text = max(locations, key=lambda location: location.get("fullName", "").count(",")).get("fullName")
+    else:
+        parts = [address.get(part) for part in ("district", "city", "province")]
+        location_text = ", ".join(part["name"] for part in parts if part and part.get("name")) or None
+    if location_text and street.get("name"):
+        location_text = " ".join(filter(None, [street["name"], street.get("number")])) + ", " + location_text
+    return location_text
+
+
+def summary_from_listing_item(item):
+    """
+    Map an offer of the listing's embedded JSON (props.pageProps.data.searchAds.items) to summary columns.
+
+    Args:
+    item (dict): The offer item.
+
+    Returns:
+    tuple: The offer href and a dict of SUMMARY_COLUMNS values (None when missing).
+    """
+    total_price = None if item.get("hidePrice") else (item.get("totalPrice") or {}).get("value")
+    summary = {
+        "titles": item.get("title"),
+        "prices": format_integer(total_price),
+        "location": format_location(item.get("location")),
+        "area": format_decimal(item.get("areaInSquareMeters")),
+        "price per square meter": format_integer((item.get("pricePerSquareMeter") or {}).get("value")),
+        "numbers_of_rooms": ROOMS_NUMBERS.get(item.get("roomsNumber"), format_integer(item.get("roomsNumber"))),
+    }
+    return "/pl/oferta/" + item["slug"], summary
+
+
+def summary_from_card(card):
+    """
+    Extract the summary columns of an offer card of a search result page.
+
+    Args:
+    card (bs4.element.Tag): The offer card.
+
+    Returns:
+    tuple: The offer href and a dict of SUMMARY_COLUMNS values (None when missing), or None if the card has no offer link.
+    """
+    link = card.select_one('a[href*="/pl/oferta/"]') or card.select_one('a[href]')
+    if link is None:
+        return None
+    summary = dict.fromkeys(SUMMARY_COLUMNS)
+    for column, selectors in (("titles", LISTING_CARD_TITLE_SELECTORS), ("location", LISTING_CARD_LOCATION_SELECTORS)):
+        for selector in selectors:
+            element = card.select_one(selector)
+            if element is not None:
+                summary[column] = element.get_text().replace("\xa0", " ").strip()
+                break
+
+    for text in card.stripped_strings:
+        text = text.replace("\xa0", " ")
+        for column, regex in (("price per square meter", CARD_PRICE_PER_M2_REGEX), ("prices", CARD_PRICE_REGEX),
+                              ("area", CARD_AREA_REGEX), ("numbers_of_rooms", CARD_ROOMS_REGEX)):
+            match = regex.match(text)
+            if match is not None and summary[column] is None:
+                summary[column] = match.group(1).replace(" ", "")
+                break
+    for column, format_value in (("prices", format_integer), ("price per square meter", format_integer), ("area", format_decimal)):
+        summary[column] = format_value(summary[column])
+    return link['href'], summary
+
+
+def listing_summaries_from_next_data(next_data):
+    """
+    Get the offer summaries of a search result page from its embedded state.
+
+    Args:
+    next_data (dict): The state returned by 'find_next_data'.
+
+    Returns:
+    list: (href, summary) tuples in page order, empty if the state has no search results.
+    """
+    try:
+        items = next_data["props"]["pageProps"]["data"]["searchAds"]["items"]
+    except (TypeError, KeyError):
+        return []
+    return list(dict(summary_from_listing_item(item) for item in items or [] if item.get("slug")).items())
+
+
+def extract_listing_summaries(bs):
+    """
+    Extract the offer summaries (title, price, location, area, price per m², rooms) from the offer cards
+    of a parsed search result page. Used when the page has no embedded state (see 'listing_summaries_from_next_data').
+
+    Args:
+    bs (bs4.BeautifulSoup): The parsed search result page.
+
+    Returns:
+    list: (href, summary) tuples in page order, empty if no offer card was found.
+    """
+    for selector in LISTING_CARD_SELECTORS:
+        cards = bs.select(selector)
+        if cards:
+            summaries = [summary_from_card(card) for card in cards]
+            return list({href: summary for href, summary in filter(None, summaries)}.items())
+    return []
+
+
+def build_summary_row(summary, offer_url, snapshot=None):
+    """
+    Build the CSV row of an offer from its listing summary, taking the other columns (and the
+    SUMMARY_SNAPSHOT_COLUMNS it has) from its last snapshot.
+
+    Args:
+    summary (dict): Summary returned by 'extract_listing_summaries'.
+    offer_url (str): The offer URL.
+    snapshot (dict, optional): The stored offer (OfferStore.get_offer) providing the columns missing from the summary.
+
+    Returns:
+    list: The row in export_module.CSV_COLUMNS order, or None if the offer has no price.
+    """
+    if summary.get("prices") is None:
+        return None
+    snapshot = snapshot or {}
+    row = []
+    for column in export_module.CSV_COLUMNS:
+        value = snapshot.get(column) if column in SUMMARY_SNAPSHOT_COLUMNS else None
+        if value is None:
+            value = summary.get(column)
+        if value is None:
+            value = snapshot.get(column)
+        if value is None:
+            value = "" if column in ("describe", "location") else "brak informacji"
+        row.append(value)
+    row[export_module.CSV_COLUMNS.index("urls")] = offer_url
+    return row
+
+
+def find_offer_ad(body: bytes):
+    """
+    Find the offer data embedded in an offer page (props.pageProps.ad of the __NEXT_DATA__ state).
+
+    Args:
+    body (bytes): The offer page body (response.content).
+
+    Returns:
+    dict: The offer data, or None if the page has none (the HTML has to be parsed).
+    """
+    next_data = find_next_data(body)
+    try:
+        ad = next_data["props"]["pageProps"]["ad"]
+    except (TypeError, KeyError):
+        return None
+    if not isinstance(ad, dict) or not ad.get("title"):
+        return None
+    return ad
+
+
+def extract_ad_fields(ad):
+    """
+    Extract the offer fields from the embedded offer data, with the keys of 'extract_offer_fields',
+    so their hit rates can be tracked by a SelectorMonitor.
+
+    Args:
+    ad (dict): The offer data returned by 'find_offer_ad'.
+
+    Returns:
+    dict: Field name -> value, None if missing. "details" is a dict of CSV column -> value of the other
+    characteristics, "price" and "price_per_m2" are "" for offers with a hidden price.
+    """
+    characteristics = {characteristic.get("key"): characteristic for characteristic in ad.get("characteristics") or []}
+    values = {}
+    for column, keys in AD_CHARACTERISTICS.items():
+        for key in keys:
+            characteristic = characteristics.get(key)
+            if characteristic is None:
+                continue
+            if column in AD_RAW_VALUE_COLUMNS:
+                value = characteristic.get("value")
+            else:
+                value = characteristic.get("localizedValue") or characteristic.get("value")
+            if value not in (None, ""):
+                values[column] = str(value)
+                break
+
+    if "floor" in values and characteristics.get("building_floors_num"):
+        values["floor"] += "/" + str(characteristics["building_floors_num"].get("value"))
+    if "seller" not in values and ad.get("advertiserType"):
+        values["seller"] = ADVERTISER_TYPES.get(ad["advertiserType"], ad["advertiserType"])
+
+    describe = ad.get("description")
+    if describe is not None:
+        describe = html.unescape(HTML_TAG_REGEX.sub(" ", describe))
+    price = values.pop("prices", None)
+    price_per_m2 = values.pop("price per square meter", None)
+    if price is None and ad.get("hidePrice"):
+        price = price_per_m2 = ""
+    return {
+        "title": ad.get("title"),
+        "price": format_integer(price),
+        "price_per_m2": format_integer(price_per_m2),
+        "location": format_location(ad.get("location")),
+        "details": values or None,
+        "describe": describe,
+    }
+
+
+def build_offer_row_from_ad(fields, offer_url):
+    """
+    Build the CSV row of an offer from its embedded data, in the format 'build_offer_row' writes
+    (integer price and price per m², area with a decimal comma).
+
+    Args:
+    fields (dict): Fields returned by 'extract_ad_fields'.
+    offer_url (str): The offer URL.
+
+    Returns:
+    list: The row in export_module.CSV_COLUMNS order, or None if the offer has a hidden price.
+
+    Raises:
+    ValueError: If a required field is missing, e.g. because a characteristic key was renamed.
+    """
+    missing_fields = [field for field in REQUIRED_FIELDS if fields.get(field) is None]
+    if missing_fields:
+        raise ValueError("Missing fields in the embedded data: " + ", ".join(missing_fields))
+    if fields["price"] == "":
+        print("Brak ceny, oferta zostanie pominięta")
+        return None
+
+    values = dict(fields["details"], titles=fields["title"], prices=fields["price"], location=fields["location"] or "", urls=offer_url)
+    values["price per square meter"] = fields["price_per_m2"]
+    values["area"] = format_decimal(values.get("area"))
+    values["numbers_of_rooms"] = format_integer(values.get("numbers_of_rooms"))
+    describe = fields["describe"] or ""
+    values["describe"] = describe.replace("\n"," ").replace("\xa0","").replace("\r"," ").replace("'"," ").replace('"',' ')
+    return [values.get(column) if values.get(column) is not None else "brak informacji" for column in export_module.CSV_COLUMNS]
+
+
+class SelectorMonitor:
+    """
+    Tracks field-level hit rates of the offer selectors (or of the embedded offer data, see 'extract_ad_fields').
+
+    During a crawl, 'check' is called after every offer: once 'sample_size' offers have been seen,
+    a required field with a hit rate below 'min_hit_rate' raises SelectorDriftError, so a broken
+    selector aborts the crawl after the first pages instead of skipping every offer.
+    """
+
+    def __init__(self, sample_size: int=36, min_hit_rate: float=0.5, required_fields=REQUIRED_FIELDS, source: str="Selectors"):
+        self.sample_size = sample_size
+        self.source = source
+        self.min_hit_rate = min_hit_rate
+        self.required_fields = list(required_fields)
+        self.pages = 0
+        self.hits = dict.fromkeys(OFFER_SELECTORS, 0)
+        self.checked = False
+
+    def update(self, fields):
+        """
+        Record the extracted fields of one offer page.
+
+        Args:
+        fields (dict): Fields returned by 'extract_offer_fields'.
+        """
+        self.pages += 1
+        for field, value in fields.items():
+            if value is not None:
+                self.hits[field] += 1
+
+    def hit_rates(self):
+        """
+        Get the share of pages on which each field was found.
+
+        Returns:
+        dict: Field name -> hit rate between 0 and 1.
+        """
+        return {field: (hits / self.pages if self.pages else 0.0) for field, hits in self.hits.items()}
+
+    def failing_fields(self):
+        """
+        Get the required fields with a hit rate below 'min_hit_rate'.
+
+        Returns:
+        list: The failing field names.
+        """
+        hit_rates = self.hit_rates()
+        return [field for field in self.required_fields if hit_rates[field] < self.min_hit_rate]
+
+    def check(self):
+        """
+        Check the hit rates once 'sample_size' pages have been seen.
+
+        Raises:
+        SelectorDriftError: If a required field is below 'min_hit_rate'.
+        """
+        if self.checked or self.pages < self.sample_size:
+            return
+        self.checked = True
+        failing_fields = self.failing_fields()
+        if failing_fields:
+            raise SelectorDriftError(self.source + " drifted, hit rates: " + self.report())
+
+    def report(self):
+        return ", ".join(f"{field}={rate:.0%}" for field, rate in self.hit_rates().items()) + f" ({self.pages} pages)"
+
+
+def get_corpus_path(corpus_dir, url):
+    """
+    Get the path under which a page is stored in the HTML fixture corpus.
+
+    Args:
+    corpus_dir (str): The corpus directory.
+    url (str): The page URL.
+
+    Returns:
+    str: The file path, named by the SHA-1 of the URL.
+    """
+    return os.path.join(corpus_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html")
+
+
+def find_in_corpus(corpus_dir, url):
+    """
+    Find a stored page in the corpus directory or one of its page type subdirectories.
+
+    Args:
+    corpus_dir (str): The corpus directory.
+    url (str): The page URL.
+
+    Returns:
+    str: The file path, or None if the page is not stored.
+    """
+    file_name = os.path.basename(get_corpus_path(corpus_dir, url))
+    for path in [os.path.join(corpus_dir, file_name)] + glob.glob(os.path.join(corpus_dir, "*", file_name)):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def save_to_corpus(corpus_dir, url, body: bytes, max_pages: int=200):
+    """
+    Store a fetched page in the HTML fixture corpus, keeping only the 'max_pages' most recent pages.
+
+    Args:
+    corpus_dir (str): The corpus directory, created if needed.
+    url (str): The page URL.
+    body (bytes): The page body.
+    max_pages (int, optional): The maximum number of pages kept in the corpus.
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    with open(get_corpus_path(corpus_dir, url), 'wb') as file:
+        file.write(body)
+    pages = sorted(glob.glob(os.path.join(corpus_dir, "*.html")), key=os.path.getmtime)
+    for page in pages[:-max_pages]:
+        os.remove(page)
+
+
+def check_corpus(corpus_dir, min_hit_rate: float=0.8):
+    """
+    Run the offer extractor over every page of a fixture corpus and report field-level hit rates.
+
+    Args:
+    corpus_dir (str): Directory with stored offer pages (*.html).
+    min_hit_rate (float, optional): The minimum hit rate of the required fields.
+
+    Returns:
+    SelectorMonitor: The monitor with the hit rates of the corpus.
+    """
+    monitor = SelectorMonitor(min_hit_rate=min_hit_rate)
+    rows = 0
+    json_rows = 0
+    for page in sorted(glob.glob(os.path.join(corpus_dir, "*.html"))):
+        with open(page, 'rb') as file:
+            body = file.read()
+        # The selectors are checked on every page, even those with embedded data
+        fields = extract_offer_fields(BeautifulSoup(body))
+        monitor.update(fields)
+        try:
+            ad = find_offer_ad(body)
+            if ad is not None:
+                json_rows += build_offer_row_from_ad(extract_ad_fields(ad), page) is not None
+            rows += build_offer_row(fields, page) is not None
+        except Exception as e:
+            print(os.path.basename(page) + ": " + str(e))
+
+    for field, rate in monitor.hit_rates().items():
+        marker = "  <<<<<<<<<<<<<<<<<<" if field in monitor.failing_fields() else ""
+        print(f"{field:>15}: {rate:7.1%}{marker}")
+    print(f"{rows} of {monitor.pages} pages produced a row, {json_rows} from the embedded JSON")
+    return monitor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the offer selectors against a corpus of stored offer pages.")
+    parser.add_argument("corpus_dir", help="directory with stored offer pages (*.html)")
+    parser.add_argument("--min-hit-rate", type=float, default=0.8, help="minimum hit rate of the required fields")
+    args = parser.parse_args()
+
+    monitor = check_corpus(args.corpus_dir, args.min_hit_rate)
+    if monitor.pages == 0:
+        print("No pages in " + args.corpus_dir)
+        sys.exit(2)
+    if monitor.failing_fields():
+        print("SELECTOR DRIFT: " + ", ".join(monitor.failing_fields()))
+        sys.exit(1)
+    print("OK")
+
+if __name__ == '__main__':
+    main()
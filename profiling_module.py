@@ -0,0 +1,200 @@
+import cProfile
+import io
+import os.path
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+SAMPLE_INTERVAL = 0.005 # seconds between stack samples
+# Allocation tracing slows Python code down many times over, which would skew the timings of CPU bound
+# stages, so it only runs in a separate opt-in pass (Profiler(trace_memory=True)) with one frame per trace
+TRACEMALLOC_FRAMES = 1
+TOP_ENTRIES = 25
+PEAK_SNAPSHOT_GROWTH = 1.2 # take a new peak snapshot when traced memory grew by 20 %
+
+# The running Profiler, None when profiling is off
+active_profiler = None
+# Stack of the stages the main thread is currently in, e.g. ["fetch", "db"]
+stage_stack = []
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Tag the code run inside the 'with' block, or the decorated function, as a crawl stage ("fetch", "parse", "db", ...).
+
+    Stages may be nested. When no profiler is running this only costs a generator call.
+
+    Args:
+    name (str): The stage name.
+    """
+    profiler = active_profiler
+    if profiler is None:
+        yield
+        return
+    stage_stack.append(name)
+    memory_before = tracemalloc.get_traced_memory()[0] if profiler.trace_memory else 0
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_stack.pop()
+        if profiler.trace_memory:
+            memory_after = tracemalloc.get_traced_memory()[0]
+            profiler.record_stage(name, elapsed, memory_after - memory_before)
+            profiler.update_peak_snapshot(memory_after)
+        else:
+            profiler.record_stage(name, elapsed, 0)
+
+
+class Profiler:
+    """
+    Profiles a crawl run with cProfile and a statistical stack sampler, or, with 'trace_memory', with tracemalloc.
+
+    The sampler thread records the main thread's stack every 'interval' seconds, prefixed with the
+    current stage path, and 'stop' writes:
+    - <output_prefix>.collapsed: collapsed stacks for flamegraph.pl, speedscope or inferno,
+    - <output_prefix>.pstats: cProfile data for snakeviz / pstats,
+    - <output_prefix>.txt: stage timings and top hot functions, or, with 'trace_memory', net allocations
+      per stage and top allocation sites at the end of the run and at the highest traced memory.
+    The memory pass's timings are not representative, so it writes no flame graph or pstats file.
+    """
+
+    def __init__(self, output_prefix: str="profile", interval: float=SAMPLE_INTERVAL, trace_memory: bool=False):
+        self.output_prefix = output_prefix
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.samples = Counter()
+        self.stage_calls = Counter()
+        self.stage_time = defaultdict(float)
+        self.stage_memory = defaultdict(int)
+        self.profile = cProfile.Profile()
+        self.stop_event = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, name="profiling-sampler", daemon=True)
+        self.thread_id = threading.get_ident()
+        self.started = None
+        self.peak_snapshot = None
+        self.peak_snapshot_size = 0
+
+    def record_stage(self, name: str, elapsed: float, memory_delta: int):
+        self.stage_calls[name] += 1
+        self.stage_time[name] += elapsed
+        self.stage_memory[name] += memory_delta
+
+    def update_peak_snapshot(self, traced_memory: int):
+        if traced_memory > self.peak_snapshot_size * PEAK_SNAPSHOT_GROWTH:
+            self.peak_snapshot = tracemalloc.take_snapshot()
+            self.peak_snapshot_size = traced_memory
+
+    def sample(self):
+        """
+        Sampler thread loop: record the main thread's stack until 'stop' is called.
+        """
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.reverse()
+            stages = ["stage:" + name for name in stage_stack] or ["stage:other"]
+            self.samples[";".join(stages + stack)] += 1
+
+    def start(self):
+        global active_profiler
+        active_profiler = self
+        self.started = time.perf_counter()
+        if self.trace_memory:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            return
+        self.sampler.start()
+        self.profile.enable()
+
+    def stop(self):
+        """
+        Stop profiling and write the profile files.
+
+        Returns:
+        str: The path of the summary file.
+        """
+        global active_profiler
+        snapshot = None
+        if self.trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        else:
+            self.profile.disable()
+            self.stop_event.set()
+            self.sampler.join()
+        active_profiler = None
+        total_time = time.perf_counter() - self.started
+
+        summary = io.StringIO()
+        if self.trace_memory:
+            summary.write(f"Memory pass, total time: {total_time:.2f} s (slowed down by allocation tracing)\n\n")
+            summary.write(f"{'stage':<15}{'calls':>10}{'net alloc KB':>15}\n")
+            for name, memory_delta in sorted(self.stage_memory.items(), key=lambda item: item[1], reverse=True):
+                summary.write(f"{name:<15}{self.stage_calls[name]:>10}{memory_delta / 1024:>15.1f}\n")
+            summary.write("\n")
+
+            traces_filter = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__),
+                             tracemalloc.Filter(False, "<frozen importlib._bootstrap>"), tracemalloc.Filter(False, "*/contextlib.py")]
+            allocation_snapshots = [("at the end of the run", snapshot)]
+            if self.peak_snapshot is not None:
+                allocation_snapshots.append((f"at peak, {self.peak_snapshot_size / 1024:.0f} KB traced", self.peak_snapshot))
+            for title, allocation_snapshot in allocation_snapshots:
+                summary.write(f"Top allocation sites ({title}):\n")
+                for statistic in allocation_snapshot.filter_traces(traces_filter).statistics("lineno")[:TOP_ENTRIES]:
+                    summary.write(f"{statistic}\n")
+                summary.write("\n")
+        else:
+            with open(self.output_prefix + ".collapsed", 'w', encoding="utf-8") as file:
+                for stack, count in self.samples.most_common():
+                    file.write(f"{stack} {count}\n")
+            self.profile.dump_stats(self.output_prefix + ".pstats")
+
+            summary.write(f"Total time: {total_time:.2f} s, {sum(self.samples.values())} stack samples\n\n")
+            summary.write("Stages (inclusive, nested stages are also counted in their parent):\n")
+            summary.write(f"{'stage':<15}{'calls':>10}{'total s':>12}{'mean ms':>12}{'% of run':>10}\n")
+            for name, elapsed in sorted(self.stage_time.items(), key=lambda item: item[1], reverse=True):
+                calls = self.stage_calls[name]
+                summary.write(f"{name:<15}{calls:>10}{elapsed:>12.2f}{1000 * elapsed / calls:>12.2f}{100 * elapsed / total_time:>9.1f}%\n")
+
+            for sort_key in ("tottime", "cumulative"):
+                summary.write(f"\nTop functions by {sort_key}:\n")
+                stats = pstats.Stats(self.profile, stream=summary)
+                stats.strip_dirs().sort_stats(sort_key).print_stats(TOP_ENTRIES)
+
+        with open(self.output_prefix + ".txt", 'w', encoding="utf-8") as file:
+            file.write(summary.getvalue())
+        print(summary.getvalue())
+        if not self.trace_memory:
+            print(f"Flame graph stacks: {self.output_prefix}.collapsed (e.g. flamegraph.pl {self.output_prefix}.collapsed > {self.output_prefix}.svg)")
+        return self.output_prefix + ".txt"
+
+
+def run_profiled(function, output_prefix: str="profile", interval: float=SAMPLE_INTERVAL, trace_memory: bool=False):
+    """
+    Run a function (e.g. web_scraper.main) under the Profiler, writing the profile files even if it fails.
+
+    Args:
+    function (callable): The function to run.
+    output_prefix (str, optional): The path prefix of the profile files.
+    interval (float, optional): Seconds between stack samples.
+    trace_memory (bool, optional): Run the allocation tracing pass instead of the timing pass.
+
+    Returns:
+    Any: The return value of the function.
+    """
+    profiler = Profiler(output_prefix, interval, trace_memory)
+    profiler.start()
+    try:
+        return function()
+    finally:
+        profiler.stop()
@@ -0,0 +1,126 @@
+import gzip
+import json
+import os
+import os.path
+import time
+
+SNAPSHOT_VERSION = 1
+
+
+class ProxyStats:
+    """
+    Request statistics of one proxy: successes, failures and the time (time.time()) of the last request.
+    """
+
+    __slots__ = ("successes", "failures", "last_check")
+
+    def __init__(self, successes: int=0, failures: int=0, last_check: float=0.0):
+        self.successes = successes
+        self.failures = failures
+        self.last_check = last_check
+
+    def record(self, success: bool):
+        if success:
+            self.successes += 1
+        else:
+            self.failures += 1
+        self.last_check = time.time()
+
+    @property
+    def score(self):
+        # Laplace smoothed success rate, so a proxy with one lucky request doesn't beat a proven one
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    def __repr__(self):
+        return f"ProxyStats(successes={self.successes}, failures={self.failures}, last_check={self.last_check:.0f})"
+
+
+def get_file_mtime(file_url: str):
+    """
+    Get the modification time of a file.
+
+    Args:
+    file_url (str): The file path.
+
+    Returns:
+    float: The modification time, or None if the file doesn't exist.
+    """
+    try:
+        return os.path.getmtime(file_url)
+    except OSError:
+        return None
+
+
+def save_snapshot(snapshot_file: str, working, stats, cooldowns, proxy_file_mtime: float=None):
+    """
+    Save the proxy pool state as gzipped JSON. The file is replaced atomically, so a crash while
+    saving never leaves a broken snapshot.
+
+    Args:
+    snapshot_file (str): The snapshot path.
+    working (list): The working proxies.
+    stats (dict): Proxy -> ProxyStats.
+    cooldowns (dict): Proxy -> time (time.time()) until which the proxy is quarantined.
+    proxy_file_mtime (float, optional): Modification time of the imported proxy file.
+    """
+    now = time.time()
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "saved_at": now,
+        "proxy_file_mtime": proxy_file_mtime,
+        "working": list(working),
+        "stats": {proxy: [proxy_stats.successes, proxy_stats.failures, round(proxy_stats.last_check, 1)] for proxy, proxy_stats in stats.items()},
+        "cooldowns": {proxy: round(until, 1) for proxy, until in cooldowns.items() if until > now},
+    }
+    temporary_file = snapshot_file + ".tmp"
+    with gzip.open(temporary_file, 'wt', encoding="utf-8") as file:
+        json.dump(snapshot, file, separators=(",", ":"))
+    os.replace(temporary_file, snapshot_file)
+
+
+def load_snapshot(snapshot_file: str, max_age: float=None):
+    """
+    Load a proxy pool snapshot saved by 'save_snapshot'.
+
+    Args:
+    snapshot_file (str): The snapshot path.
+    max_age (float, optional): Ignore snapshots older than this many seconds.
+
+    Returns:
+    dict: The snapshot with "working" (list), "stats" (dict of ProxyStats), "cooldowns" (dict, expired
+    cooldowns dropped), "saved_at" and "proxy_file_mtime", or None if there is no usable snapshot.
+    """
+    if not os.path.isfile(snapshot_file):
+        return None
+    try:
+        with gzip.open(snapshot_file, 'rt', encoding="utf-8") as file:
+            snapshot = json.load(file)
+    except (OSError, ValueError) as e:
+        print("Can't read the proxy pool snapshot " + snapshot_file + ": " + str(e))
+        return None
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+    now = time.time()
+    if max_age is not None and now - snapshot["saved_at"] > max_age:
+        return None
+
+    snapshot["stats"] = {proxy: ProxyStats(*values) for proxy, values in snapshot["stats"].items()}
+    snapshot["cooldowns"] = {proxy: until for proxy, until in snapshot["cooldowns"].items() if until > now}
+    return snapshot
+
+
+def top_proxies(proxies, stats, k: int):
+    """
+    Get the 'k' best proxies by score, the most recently successful first among equal scores.
+
+    Args:
+    proxies (list): The candidate proxies.
+    stats (dict): Proxy -> ProxyStats.
+    k (int): The number of proxies.
+
+    Returns:
+    list: The best proxies.
+    """
+    no_stats = ProxyStats()
+    ranked = sorted(dict.fromkeys(proxies), key=lambda proxy: (stats.get(proxy, no_stats).score, stats.get(proxy, no_stats).last_check), reverse=True)
+    return ranked[:k]
@@ -0,0 +1,18 @@
+import os.path
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to this tests directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db_module
+
+
+@pytest.fixture
+def db(tmp_path):
+    """
+    A Database in a temporary file.
+    """
+    database = db_module.Database(str(tmp_path / "test_data_base"))
+    yield database
+    database.conn.close()
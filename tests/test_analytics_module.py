@@ -0,0 +1,88 @@
+import csv
+import os
+
+import pandas as pd
+
+import analytics_module
+import export_module
+
+
+def write_crawl(file_url, offers):
+    """
+    Write a scraper CSV file with (url, location, price, area) offers.
+    """
+    with open(file_url, 'w', newline='', encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(export_module.CSV_COLUMNS)
+        for url, location, price, area in offers:
+            row = dict.fromkeys(export_module.CSV_COLUMNS, "")
+            row.update({"urls": url, "location": location, "prices": price, "area": area, "numbers_of_rooms": "2", "price per square meter": ""})
+            writer.writerow([row[column] for column in export_module.CSV_COLUMNS])
+
+
+def test_get_crawl_date():
+    assert analytics_module.get_crawl_date("data/oto_dom_wroclaw_05_11_2023.parquet") == "2023-11-05"
+    assert analytics_module.get_crawl_date("offers.csv") is None
+
+
+def test_parse_numeric():
+    series = pd.Series(["650000", "48,5", "12 345", "brak informacji", None])
+    assert analytics_module.parse_numeric(series).tolist()[:3] == [650000.0, 48.5, 12345.0]
+    assert analytics_module.parse_numeric(series).isna().tolist() == [False, False, False, True, True]
+
+
+def test_clean_listings_district_and_price_per_m2():
+    listings = pd.DataFrame({
+        "urls": ["a", "b"],
+        "location": ["ul. Prosta, Krzyki, Wrocław, dolnośląskie", "Psie Pole"],
+        "prices": ["500 000", "300000"],
+        "area": ["50", "0"],
+        "numbers_of_rooms": ["2", "1"],
+        "price per square meter": ["10 000", ""],
+    })
+    cleaned = analytics_module.clean_listings(listings)
+    assert cleaned["district"].astype(str).tolist() == ["Krzyki", "Psie Pole"]
+    assert cleaned["price_per_m2"].iloc[0] == 10000.0
+    # A zero area gives no price per square meter instead of inf
+    assert pd.isna(cleaned["price_per_m2"].iloc[1])
+
+
+def test_outliers_are_excluded_from_price_statistics(tmp_path):
+    offers = [(f"/oferta/{index}", "ul. A, Krzyki, Wrocław, dolnośląskie", str(500000 + index * 1000), "50") for index in range(9)]
+    offers.append(("/oferta/absurd", "ul. A, Krzyki, Wrocław, dolnośląskie", "50000000", "50"))
+    # The same offer listed on two pages is counted once
+    offers.append(offers[0])
+    file_url = tmp_path / "oto_dom_wroclaw_05_11_2023"
+    write_crawl(file_url, offers)
+
+    aggregates = analytics_module.compute_district_aggregates(analytics_module.load_crawl(str(file_url)), "2023-11-05")
+    krzyki = aggregates.set_index("district").loc["Krzyki"]
+    assert krzyki["offers"] == 10
+    assert krzyki["outliers"] == 1
+    assert krzyki["median_price"] == 504000.0
+
+
+def test_update_district_aggregates_recomputes_changed_files(db, tmp_path):
+    file_url = str(tmp_path / "oto_dom_wroclaw_05_11_2023")
+    write_crawl(file_url, [("/oferta/1", "ul. A, Krzyki, Wrocław, dolnośląskie", "500000", "50")])
+    crawl_files = {"2023-11-05": file_url}
+
+    assert analytics_module.update_district_aggregates(db, crawl_files) == ["2023-11-05"]
+    assert analytics_module.update_district_aggregates(db, crawl_files) == []
+
+    # The crawl was still being written: the cached aggregates are replaced, not kept nor duplicated
+    write_crawl(file_url, [("/oferta/1", "ul. A, Krzyki, Wrocław, dolnośląskie", "500000", "50"),
+                           ("/oferta/2", "ul. B, Krzyki, Wrocław, dolnośląskie", "600000", "50")])
+    stat = os.stat(file_url)
+    os.utime(file_url, (stat.st_atime, stat.st_mtime + 1))
+    assert analytics_module.update_district_aggregates(db, crawl_files) == ["2023-11-05"]
+    aggregates = analytics_module.get_district_aggregates(db, update=False)
+    assert aggregates["offers"].tolist() == [2]
+
+
+def test_update_district_aggregates_caches_empty_crawls(db, tmp_path):
+    file_url = str(tmp_path / "oto_dom_wroclaw_06_11_2023")
+    write_crawl(file_url, [])
+    crawl_files = {"2023-11-06": file_url}
+    assert analytics_module.update_district_aggregates(db, crawl_files) == ["2023-11-06"]
+    assert analytics_module.update_district_aggregates(db, crawl_files) == []
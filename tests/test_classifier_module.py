@@ -0,0 +1,75 @@
+import pytest
+import requests
+
+import classifier_module
+
+LISTING_URL = "https://www.otodom.pl/pl/wyniki/sprzedaz/mieszkanie/wroclaw"
+LISTING_PAGE = b"<html><body>" + b'<a href="/pl/oferta/mieszkanie-ID1">offer</a>' * 50 + b"x" * 20000 + b"</body></html>"
+
+
+def make_response(body: bytes, status_code: int=200, url: str=LISTING_URL):
+    response = requests.models.Response()
+    response.status_code = status_code
+    response.url = url
+    response._content = body
+    return response
+
+
+def block_page(text: bytes):
+    return b"<html><head><title>" + text + b"</title></head><body>" + b" " * 5000 + b"</body></html>"
+
+
+def test_no_response_is_a_soft_ban():
+    assert classifier_module.classify_response(None) == classifier_module.SOFT_BAN
+
+
+@pytest.mark.parametrize("status_code, verdict", [
+    (404, classifier_module.NOT_FOUND),
+    (410, classifier_module.NOT_FOUND),
+    (429, classifier_module.SOFT_BAN),
+    (403, classifier_module.BLOCKED),
+    (503, classifier_module.BLOCKED),
+])
+def test_status_codes(status_code, verdict):
+    assert classifier_module.classify_response(make_response(LISTING_PAGE, status_code)) == verdict
+
+
+def test_login_redirect():
+    response = make_response(LISTING_PAGE, url="https://www.otodom.pl/pl/logowanie?redirect=x")
+    assert classifier_module.classify_response(response) == classifier_module.LOGIN_REDIRECT
+
+
+def test_tiny_page_is_a_soft_ban():
+    assert classifier_module.classify_response(make_response(b"<html></html>")) == classifier_module.SOFT_BAN
+
+
+@pytest.mark.parametrize("marker", [b"cf-chl-opt", b"/cdn-cgi/challenge-platform/h/b", b"geo.captcha-delivery.com/datadome", b"_px3"])
+def test_captcha_pages(marker):
+    assert classifier_module.classify_response(make_response(block_page(marker))) == classifier_module.CAPTCHA
+
+
+@pytest.mark.parametrize("text", [b"Access Denied", b"Attention Required! | Cloudflare", b"Too Many Requests"])
+def test_block_pages(text):
+    assert classifier_module.classify_response(make_response(block_page(text))) == classifier_module.BLOCKED
+
+
+def test_page_loading_recaptcha_is_not_a_captcha_page():
+    page = b'<html><script src="https://www.google.com/recaptcha/api.js"></script>' + LISTING_PAGE
+    assert classifier_module.classify_response(make_response(page), "listing") == classifier_module.OK
+
+
+def test_page_with_offers_is_never_a_block_page():
+    page = b"<html><p>access denied for pets</p>" + LISTING_PAGE
+    assert classifier_module.classify_response(make_response(page), "listing") == classifier_module.OK
+
+
+def test_large_pages_are_not_sniffed():
+    page = block_page(b"Access Denied") + b"x" * classifier_module.MAX_BLOCK_PAGE_BYTES
+    assert classifier_module.classify_response(make_response(page)) == classifier_module.OK
+
+
+def test_empty_listing():
+    page = b"<html>" + b"x" * 10000 + b"</html>"
+    assert classifier_module.classify_response(make_response(page), "listing") == classifier_module.EMPTY_LISTING
+    # Only result pages must link to offers
+    assert classifier_module.classify_response(make_response(page), "offer") == classifier_module.OK
@@ -0,0 +1,30 @@
+import pytest
+
+import cli
+
+
+@pytest.fixture(autouse=True)
+def no_default_config_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def test_invalid_settings_exit_with_2(capsys):
+    assert cli.main(["scrape", "--set", "network.timeout=fast"]) == 2
+    assert "network.timeout" in capsys.readouterr().err
+
+
+def test_profile_memory_requires_profile(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(["scrape", "--profile-memory"])
+    assert exit_info.value.code == 2
+    assert "--profile-memory requires --profile" in capsys.readouterr().err
+
+
+def test_export_rejects_unsupported_compression(tmp_path, capsys):
+    assert cli.main(["export", str(tmp_path / "offers.csv"), "--format", "arrow", "--set", "output.compression=snappy"]) == 2
+    assert "output.compression" in capsys.readouterr().err
+
+
+def test_export_needs_a_binary_format(tmp_path, capsys):
+    assert cli.main(["export", str(tmp_path / "offers.csv")]) == 2
+    assert "--format parquet or arrow" in capsys.readouterr().err
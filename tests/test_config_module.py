@@ -0,0 +1,91 @@
+import os.path
+
+import pytest
+
+import config_module
+
+REPO_CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), config_module.DEFAULT_CONFIG_FILE)
+
+
+@pytest.fixture(autouse=True)
+def no_default_config_file(tmp_path, monkeypatch):
+    # Without an explicit file, load_settings reads scraper.ini from the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+def write_config(tmp_path, text):
+    config_file = tmp_path / "test.ini"
+    config_file.write_text(text, encoding="utf-8")
+    return str(config_file)
+
+
+def test_defaults():
+    settings = config_module.load_settings()
+    assert settings["network"]["timeout"] == 4.0
+    assert settings["network"]["valid_statuses"] == [200, 301, 302, 307, 404]
+    assert settings["scrape"]["mode"] == "full"
+    assert settings["output"]["compression"] == "zstd"
+
+
+def test_repository_config_file_matches_the_defaults():
+    assert config_module.load_settings(REPO_CONFIG_FILE) == config_module.load_settings()
+
+
+@pytest.mark.parametrize("crawl_profile", ["fast", "gentle", "daily"])
+def test_repository_crawl_profiles_are_valid(crawl_profile):
+    config_module.load_settings(REPO_CONFIG_FILE, crawl_profile)
+
+
+def test_config_file_profile_and_overrides_apply_in_order(tmp_path):
+    config_file = write_config(tmp_path, "[network]\ntimeout = 6\nconcurrency = 4\n\n"
+                                         "[crawl_profile:fast]\nnetwork.timeout = 2\nscrape.mode = summary\n")
+    settings = config_module.load_settings(config_file, "fast", ["network.timeout=3", "output.format = parquet"])
+    assert settings["network"]["concurrency"] == 4
+    assert settings["network"]["timeout"] == 3.0
+    assert settings["scrape"]["mode"] == "summary"
+    assert settings["output"]["format"] == "parquet"
+
+
+def test_errors_are_collected(tmp_path):
+    config_file = write_config(tmp_path, "[network]\ntimeout = fast\nconcurrency = 0\nretries = 3\n\n[scrape]\nmode = everything\n")
+    with pytest.raises(config_module.ConfigError) as error:
+        config_module.load_settings(config_file, "nightly", ["proxies.min_working=x", "timeout=2", "output.level=9"])
+    message = str(error.value)
+    assert message.startswith("Invalid configuration:")
+    for expected in ["'fast' for network.timeout, expected float",
+                     "'0' for network.concurrency, expected between 1 and 256",
+                     "Unknown setting [network] retries",
+                     "'everything' for scrape.mode, expected full / summary",
+                     "Unknown crawl profile 'nightly'",
+                     "'x' for proxies.min_working, expected int",
+                     "Invalid setting 'timeout=2', expected section.key=value",
+                     "Unknown setting output.level"]:
+        assert expected in message
+    assert len(message.splitlines()) == 9
+
+
+def test_missing_config_file():
+    with pytest.raises(config_module.ConfigError, match="does not exist"):
+        config_module.load_settings("missing.ini")
+
+
+def test_min_working_above_target_working():
+    with pytest.raises(config_module.ConfigError, match="min_working"):
+        config_module.load_settings(overrides=["proxies.min_working=60", "proxies.target_working=50"])
+
+
+@pytest.mark.parametrize("output_format, compression, valid", [
+    ("arrow", "snappy", False),
+    ("arrow", "gzip", False),
+    ("arrow", "lz4", True),
+    ("arrow", "none", True),
+    ("parquet", "snappy", True),
+    ("csv", "snappy", True),
+])
+def test_compression_is_checked_against_the_format(output_format, compression, valid):
+    overrides = ["output.format=" + output_format, "output.compression=" + compression]
+    if valid:
+        assert config_module.load_settings(overrides=overrides)["output"]["compression"] == compression
+    else:
+        with pytest.raises(config_module.ConfigError, match="output.compression with output.format = arrow"):
+            config_module.load_settings(overrides=overrides)
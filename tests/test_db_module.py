@@ -0,0 +1,72 @@
+import pytest
+
+import db_module
+
+
+@pytest.fixture
+def employees(db):
+    db.create_table("employees", "id INTEGER PRIMARY KEY AUTOINCREMENT", "name TEXT", "age INTEGER", "city TEXT")
+    db.insert("employees", (None, "Jan", 30, "Wrocław"), (None, "Ala", 17, "Kraków"), (None, "Olek", 45, "Wrocław"), (None, "Ewa", 18, "New York"))
+    return db
+
+
+def test_build_conditions_without_conditions():
+    assert db_module.build_conditions() == ("", [])
+
+
+def test_build_conditions_binds_values():
+    where_clause, params = db_module.build_conditions(age=">__18", city="!=__New York")
+    assert where_clause == "WHERE age > ? AND city != ?"
+    assert params == ["18", "New York"]
+
+
+def test_build_conditions_equality_and_or():
+    where_clause, params = db_module.build_conditions("OR", name="Jan", age=30)
+    assert where_clause == "WHERE name == ? OR age == ?"
+    assert params == ["Jan", 30]
+
+
+def test_build_conditions_between():
+    assert db_module.build_conditions(age="BETWEEN__18 AND 40") == ("WHERE age BETWEEN ? AND ?", ["18", "40"])
+
+
+def test_build_conditions_value_with_separator():
+    # Only the first "__" separates the operator, the rest belongs to the value
+    assert db_module.build_conditions(name="LIKE__%__x") == ("WHERE name LIKE ?", ["%__x"])
+
+
+@pytest.mark.parametrize("kwargs", [{"condition_operator": "XOR", "age": 1}, {"age": "; DROP TABLE employees__1"}])
+def test_build_conditions_rejects_unknown_operators(kwargs):
+    with pytest.raises(ValueError):
+        db_module.build_conditions(**kwargs)
+
+
+def test_iter_rows(employees):
+    assert list(employees.iter_rows("employees", "name", "age", chunk_size=1)) == [("Jan", 30), ("Ala", 17), ("Olek", 45), ("Ewa", 18)]
+
+
+def test_iter_rows_with_conditions(employees):
+    assert [name for (name,) in employees.iter_rows("employees", "name", age=">=__18", city="Wrocław")] == ["Jan", "Olek"]
+    assert [name for (name,) in employees.iter_rows("employees", "name", condition_operator="OR", age="<__18", city="New York")] == ["Ala", "Ewa"]
+
+
+def test_iter_rows_values_are_not_sql(employees):
+    # A value is bound as a parameter, never interpolated into the query
+    assert list(employees.iter_rows("employees", name="x' OR '1'='1")) == []
+    assert employees.get_row_count("employees") == 4
+
+
+def test_iter_rows_leaves_the_main_cursor_usable(employees):
+    rows = employees.iter_rows("employees", "name", chunk_size=2)
+    assert next(rows) == ("Jan",)
+    assert employees.get_row_count("employees") == 4
+    assert [name for (name,) in rows] == ["Ala", "Olek", "Ewa"]
+
+
+def test_iter_table_df(employees):
+    chunks = list(employees.iter_table_df("employees", "name", "age", chunksize=3, city="Wrocław"))
+    assert [chunk["name"].tolist() for chunk in chunks] == [["Jan", "Olek"]]
+
+
+def test_get_table_df_with_conditions_limit(employees):
+    assert employees.get_table_df_with_conditions("employees", "name", limit=2, age=">__10")["name"].tolist() == ["Jan", "Ala"]
@@ -0,0 +1,71 @@
+import csv
+
+import pytest
+
+import export_module
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("650000", 650000.0),
+    ("48,5", 48.5),
+    ("12 345", 12345.0),
+    ("12\xa0345,50", 12345.5),
+    (552000, 552000.0),
+    (54.5, 54.5),
+])
+def test_parse_number(value, expected):
+    assert export_module.parse_number(value) == expected
+
+
+@pytest.mark.parametrize("value", [None, "", "brak informacji", "Zapytaj o cenę", "abc"])
+def test_parse_number_missing(value):
+    assert export_module.parse_number(value) is None
+
+
+@pytest.mark.parametrize("value, expected", [("3", 3), ("3,0", 3), ("2,5", None), ("więcej niż 10", None), (None, None)])
+def test_parse_integer(value, expected):
+    assert export_module.parse_integer(value) == expected
+
+
+def test_parse_text_maps_placeholders_to_none():
+    assert export_module.parse_text("brak informacji") is None
+    assert export_module.parse_text("") is None
+    assert export_module.parse_text("gazowe") == "gazowe"
+
+
+def test_make_sink_csv(tmp_path):
+    row = [str(index) for index in range(len(export_module.CSV_COLUMNS))]
+    with export_module.make_sink(str(tmp_path / "offers")) as sink:
+        sink.write_row(row)
+    with open(tmp_path / "offers", newline='', encoding="utf-8") as file:
+        assert list(csv.reader(file)) == [export_module.CSV_COLUMNS, row]
+
+
+def test_make_sink_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        export_module.make_sink(str(tmp_path / "offers"), "xlsx")
+
+
+def test_arrow_sink_rejects_unsupported_compression(tmp_path):
+    pytest.importorskip("pyarrow")
+    with pytest.raises(ValueError):
+        export_module.ArrowSink(str(tmp_path / "offers.arrows"), "arrow", compression="snappy")
+
+
+def test_convert_csv_to_parquet_is_typed(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    row = ["" for _ in export_module.CSV_COLUMNS]
+    row[export_module.CSV_COLUMNS.index("prices")] = "552 000"
+    row[export_module.CSV_COLUMNS.index("area")] = "54,5"
+    row[export_module.CSV_COLUMNS.index("numbers_of_rooms")] = "3"
+    row[export_module.CSV_COLUMNS.index("type_of_heating")] = "brak informacji"
+    csv_url = tmp_path / "offers.csv"
+    with open(csv_url, 'w', newline='', encoding="utf-8") as file:
+        csv.writer(file).writerows([export_module.CSV_COLUMNS, row])
+
+    table = pq.read_table(export_module.convert_csv(str(csv_url), "parquet", compression="zstd"))
+    assert table.column("prices").to_pylist() == [552000.0]
+    assert table.column("area").to_pylist() == [54.5]
+    assert table.column("numbers_of_rooms").to_pylist() == [3]
+    assert table.column("type_of_heating").to_pylist() == [None]
@@ -0,0 +1,83 @@
+import pytest
+
+import offer_store_module
+
+
+@pytest.fixture
+def store(db):
+    return offer_store_module.OfferStore(db)
+
+
+@pytest.mark.parametrize("href, expected", [
+    ("/pl/oferta/mieszkanie-3-pokojowe-ID4mXyZ", "ID4mXyZ"),
+    ("https://www.otodom.pl/pl/oferta/mieszkanie-ID4mXyZ?utm=1", "ID4mXyZ"),
+    ("/pl/oferta/mieszkanie-ID4mXyZ/", "ID4mXyZ"),
+    ("/pl/oferta/mieszkanie-bez-id", "mieszkanie-bez-id"),
+])
+def test_parse_offer_id(href, expected):
+    assert offer_store_module.parse_offer_id(href) == expected
+
+
+def test_record_returns_changed_fields(store):
+    url = "https://www.otodom.pl/pl/oferta/a-ID1"
+    assert store.record("ID1", url, {"prices": "500000", "area": "50", "urls": url}, "2023-11-01") == ["prices", "area"]
+    assert store.record("ID1", url, {"prices": "500000", "area": "50"}, "2023-11-02") == []
+    assert store.record("ID1", url, {"prices": "480000", "area": "50"}, "2023-11-03") == ["prices"]
+
+
+def test_record_keeps_snapshot_fields_not_in_the_update(store):
+    store.record("ID1", "url-1", {"prices": "500000", "location": "ul. A, Krzyki"}, "2023-11-01")
+    store.record("ID1", "url-2", {"prices": "490000"}, "2023-11-02")
+    offer = store.get_offer("ID1")
+    assert offer["prices"] == "490000"
+    assert offer["location"] == "ul. A, Krzyki"
+    assert (offer["urls"], offer["first_seen"], offer["last_seen"]) == ("url-2", "2023-11-01", "2023-11-02")
+
+
+def test_is_known(store):
+    assert not store.is_known("ID1")
+    assert store.get_offer("ID1") is None
+    store.record("ID1", "url", {"prices": "1"}, "2023-11-01")
+    assert store.is_known("ID1")
+
+
+def test_record_commits_in_batches(db):
+    store = offer_store_module.OfferStore(db, commit_every=2)
+    store.record("ID1", "url", {"prices": "1"}, "2023-11-01")
+    assert db.conn.in_transaction
+    store.record("ID2", "url", {"prices": "1"}, "2023-11-01")
+    assert not db.conn.in_transaction
+
+
+def test_price_history(store):
+    for date, price in [("2023-11-01", "500000"), ("2023-11-02", "500000"), ("2023-11-03", "480000")]:
+        store.record("ID1", "url", {"prices": price}, date)
+    assert store.price_history("ID1") == [("2023-11-01", "500000"), ("2023-11-03", "480000")]
+
+
+def test_price_drops(store):
+    store.record("ID1", "url", {"prices": "500000"}, "2023-11-01")
+    store.record("ID1", "url", {"prices": "480000"}, "2023-11-05")
+    store.record("ID2", "url", {"prices": "300000"}, "2023-11-01")
+    store.record("ID2", "url", {"prices": "310000"}, "2023-11-05")
+    # A hidden price (empty value) is not a drop
+    store.record("ID3", "url", {"prices": "400000"}, "2023-11-01")
+    store.record("ID3", "url", {"prices": ""}, "2023-11-05")
+    store.record("ID4", "url", {"prices": "200000"}, "2023-11-01")
+    store.record("ID4", "url", {"prices": "190000"}, "2023-11-09")
+
+    assert store.price_drops("2023-11-02") == [("ID1", "2023-11-05", "500000", "480000"), ("ID4", "2023-11-09", "200000", "190000")]
+    assert store.price_drops("2023-11-02", "2023-11-06") == [("ID1", "2023-11-05", "500000", "480000")]
+
+
+def test_compact(store, db):
+    for date, price in [("2023-11-01", "500000"), ("2023-11-02", "490000"), ("2023-11-03", "480000"), ("2023-11-10", "470000")]:
+        store.record("ID1", "url", {"prices": price, "area": "50"}, date)
+
+    # Two older price changes are collapsed into the one of 2023-11-03, the area only changed once
+    assert store.compact("2023-11-05") == 2
+    assert store.price_history("ID1") == [("2023-11-03", "480000"), ("2023-11-10", "470000")]
+    db.cur.execute("SELECT field, previous_value FROM offer_history WHERE date < ? ORDER BY field", ("2023-11-05",))
+    assert db.cur.fetchall() == [("area", None), ("prices", None)]
+    # The change after the compacted range still knows its previous price
+    assert store.price_drops("2023-11-05") == [("ID1", "2023-11-10", "480000", "470000")]
@@ -0,0 +1,301 @@
+import json
+
+from bs4 import BeautifulSoup
+import pytest
+
+import export_module
+import parser_module
+
+OFFER_URL = "https://www.otodom.pl/pl/oferta/mieszkanie-3-pokojowe-ID4mXyZ"
+DETAILS = ["Powierzchnia", "54,5 m²", "Forma własności", "pełna własność", "Liczba pokoi", "3", "Stan wykończenia", "do zamieszkania",
+           "Piętro", "2/4", "Balkon / ogród / taras", "balkon", "Czynsz", "600 zł", "Miejsce parkingowe", "garaż",
+           "Obsługa zdalna", "brak informacji", "Ogrzewanie", "miejskie", "Rynek", "wtórny", "Typ ogłoszeniodawcy", "prywatny",
+           "Dostępne od", "brak informacji", "Rok budowy", "2005", "Rodzaj zabudowy", "blok", "Okna", "plastikowe", "Winda", "tak",
+           "Media", "internet", "Zabezpieczenia", "domofon", "Wyposażenie", "meble", "Informacje dodatkowe", "piwnica",
+           "Materiał budynku", "cegła"]
+
+
+def offer_page(price="552\xa0000 zł", title="Mieszkanie 3 pokojowe", details=DETAILS):
+    details_html = "".join(f'<div class="enb64yk1">{text}</div>' for text in details)
+    return (f'<html><body><h1 data-cy="adPageAdTitle">{title}</h1>'
+            f'<strong data-cy="adPageHeaderPrice">{price}</strong>'
+            f'<div aria-label="Cena za metr kwadratowy">10\xa0128 zł/m²</div>'
+            f'<a aria-label="Adres">ul. Prosta, Krzyki, Wrocław, dolnośląskie</a>'
+            f'{details_html}<div data-cy="adPageAdDescription">Ładne\nmieszkanie</div></body></html>')
+
+
+def test_extract_offer_links_falls_back_and_deduplicates():
+    bs = BeautifulSoup('<a href="/pl/oferta/a-ID1">a</a><a href="/pl/oferta/b-ID2">b</a><a href="/pl/oferta/a-ID1">a</a><a href="/pl/blog">x</a>', "html.parser")
+    assert parser_module.extract_offer_links(bs) == ["/pl/oferta/a-ID1", "/pl/oferta/b-ID2"]
+
+
+def test_extract_offer_fields_and_build_offer_row():
+    fields = parser_module.extract_offer_fields(BeautifulSoup(offer_page(), "html.parser"))
+    assert fields["title"] == "Mieszkanie 3 pokojowe"
+    row = dict(zip(export_module.CSV_COLUMNS, parser_module.build_offer_row(fields, OFFER_URL)))
+    assert row["prices"] == "552000"
+    assert row["price per square meter"] == "10128"
+    assert row["area"] == "54,5"
+    assert row["numbers_of_rooms"] == "3"
+    assert row["seller"] == "prywatny"
+    assert row["bulding_material"] == "cegła"
+    assert row["describe"] == "Ładne mieszkanie"
+    assert row["urls"] == OFFER_URL
+
+
+def test_build_offer_row_missing_fields():
+    fields = parser_module.extract_offer_fields(BeautifulSoup(offer_page(details=DETAILS[:10]), "html.parser"))
+    assert fields["details"] is None
+    with pytest.raises(ValueError, match="details"):
+        parser_module.build_offer_row(fields, OFFER_URL)
+
+
+def test_build_offer_row_hidden_price():
+    page = offer_page(price="Zapytaj o cenę").replace("10\xa0128 zł/m²", "")
+    fields = parser_module.extract_offer_fields(BeautifulSoup(page, "html.parser"))
+    assert parser_module.build_offer_row(fields, OFFER_URL) is None
+
+
+def test_selector_monitor_waits_for_the_sample():
+    monitor = parser_module.SelectorMonitor(sample_size=3, min_hit_rate=0.5)
+    missing_price = dict.fromkeys(parser_module.OFFER_SELECTORS, "x")
+    missing_price["price"] = None
+    for _ in range(2):
+        monitor.update(missing_price)
+        monitor.check()
+    monitor.update(missing_price)
+    with pytest.raises(parser_module.SelectorDriftError, match="^Selectors drifted"):
+        monitor.check()
+    assert monitor.failing_fields() == ["price"]
+    assert monitor.hit_rates()["price"] == 0.0
+
+
+def test_selector_monitor_checks_once():
+    monitor = parser_module.SelectorMonitor(sample_size=2, min_hit_rate=0.5, source="Embedded offer data")
+    fields = dict.fromkeys(parser_module.OFFER_SELECTORS, "x")
+    monitor.update(fields)
+    monitor.update(dict(fields, title=None))
+    monitor.check()
+    # Later drift is not re-checked during the crawl, 'failing_fields' still reports it
+    for _ in range(5):
+        monitor.update(dict(fields, title=None))
+    monitor.check()
+    assert monitor.failing_fields() == ["title"]
+    assert monitor.report().endswith("(7 pages)")
+
+
+def test_corpus_round_trip(tmp_path):
+    corpus_dir = str(tmp_path / "corpus")
+    parser_module.save_to_corpus(corpus_dir + "/offer", OFFER_URL, b"<html>1</html>")
+    path = parser_module.find_in_corpus(corpus_dir, OFFER_URL)
+    with open(path, 'rb') as file:
+        assert file.read() == b"<html>1</html>"
+    assert parser_module.find_in_corpus(corpus_dir, OFFER_URL + "?other") is None
+
+
+def test_save_to_corpus_keeps_the_latest_pages(tmp_path):
+    for index in range(5):
+        parser_module.save_to_corpus(str(tmp_path), f"{OFFER_URL}-{index}", b"x", max_pages=3)
+    assert len(list(tmp_path.glob("*.html"))) == 3
+
+
+def test_check_corpus(tmp_path, capsys):
+    parser_module.save_to_corpus(str(tmp_path), OFFER_URL, offer_page().encode("utf-8"))
+    parser_module.save_to_corpus(str(tmp_path), OFFER_URL + "-2", b"<html><h1>moved</h1></html>")
+    monitor = parser_module.check_corpus(str(tmp_path))
+    assert monitor.pages == 2
+    assert monitor.hit_rates()["title"] == 1.0
+    assert monitor.failing_fields() == ["price", "price_per_m2", "details"]
+    assert "1 of 2 pages produced a row" in capsys.readouterr().out
+
+
+LISTING_ITEM = {
+    "slug": "mieszkanie-3-pokojowe-ID4mXyZ",
+    "title": "Mieszkanie 3 pokojowe",
+    "totalPrice": {"value": 552000, "currency": "PLN"},
+    "pricePerSquareMeter": {"value": 10128.44, "currency": "PLN"},
+    "areaInSquareMeters": 54.5,
+    "roomsNumber": "THREE",
+    "hidePrice": False,
+    "location": {"address": {"street": {"name": "ul. Prosta", "number": "5"}},
+                 "reverseGeocoding": {"locations": [{"fullName": "Wrocław, dolnośląskie"}, {"fullName": "Krzyki, Wrocław, dolnośląskie"}]}},
+}
+
+
+def listing_next_data(items, total_pages=7):
+    return {"props": {"pageProps": {"data": {"searchAds": {"items": items, "pagination": {"totalPages": total_pages}}}}}}
+
+
+def test_get_page_count():
+    assert parser_module.get_page_count(listing_next_data([])) == 7
+    assert parser_module.get_page_count({"props": {}}) is None
+    assert parser_module.get_page_count(None) is None
+
+
+def test_listing_summaries_from_next_data():
+    hidden = dict(LISTING_ITEM, slug="dom-ID2", hidePrice=True, roomsNumber=None, location={})
+    summaries = parser_module.listing_summaries_from_next_data(listing_next_data([LISTING_ITEM, hidden, LISTING_ITEM, {"title": "no slug"}]))
+    assert [href for href, _ in summaries] == ["/pl/oferta/mieszkanie-3-pokojowe-ID4mXyZ", "/pl/oferta/dom-ID2"]
+    assert summaries[0][1] == {
+        "titles": "Mieszkanie 3 pokojowe",
+        "prices": "552000",
+        "location": "ul. Prosta 5, Krzyki, Wrocław, dolnośląskie",
+        "area": "54,5",
+        "price per square meter": "10128",
+        "numbers_of_rooms": "3",
+    }
+    assert summaries[1][1]["prices"] is None
+    assert summaries[1][1]["location"] is None
+
+
+def test_listing_summaries_without_search_results():
+    assert parser_module.listing_summaries_from_next_data({"props": {"pageProps": {}}}) == []
+    assert parser_module.listing_summaries_from_next_data(None) == []
+
+
+def test_extract_listing_summaries_from_cards():
+    card = ('<article data-cy="listing-item"><a href="/pl/oferta/{slug}"><p data-cy="listing-item-title">{title}</p></a>'
+            '<span>{price}</span><span>10\xa0128 zł/m²</span><dl><dd>3 pokoje</dd><dd>54,5 m²</dd></dl>'
+            '<p data-testid="advert-card-address">Krzyki, Wrocław</p></article>')
+    page = card.format(slug="a-ID1", title="Mieszkanie A", price="552\xa0000 zł") + card.format(slug="b-ID2", title="Mieszkanie B", price="Zapytaj o cenę")
+    summaries = parser_module.extract_listing_summaries(BeautifulSoup(page, "html.parser"))
+    assert [href for href, _ in summaries] == ["/pl/oferta/a-ID1", "/pl/oferta/b-ID2"]
+    assert summaries[0][1] == {"titles": "Mieszkanie A", "prices": "552000", "location": "Krzyki, Wrocław", "area": "54,5",
+                               "price per square meter": "10128", "numbers_of_rooms": "3"}
+    assert summaries[1][1]["prices"] is None
+
+
+def test_card_and_offer_page_values_match():
+    # Known offers are written from the listing, their values must not differ from the offer page's
+    page_row = dict(zip(export_module.CSV_COLUMNS, parser_module.build_offer_row(
+        parser_module.extract_offer_fields(BeautifulSoup(offer_page(), "html.parser")), OFFER_URL)))
+    _, summary = parser_module.listing_summaries_from_next_data(listing_next_data([LISTING_ITEM]))[0]
+    for column in ["prices", "area", "price per square meter", "numbers_of_rooms"]:
+        assert summary[column] == page_row[column]
+
+
+def test_build_summary_row():
+    snapshot = {"location": "ul. Prosta 5, Krzyki, Wrocław, dolnośląskie", "floor": "2/4", "describe": "Ładne", "urls": "old"}
+    summary = {"titles": "Mieszkanie", "prices": "540000", "location": "Krzyki, Wrocław", "area": "54,5",
+               "price per square meter": "9908", "numbers_of_rooms": "3"}
+    row = dict(zip(export_module.CSV_COLUMNS, parser_module.build_summary_row(summary, OFFER_URL, snapshot)))
+    assert row["prices"] == "540000"
+    # The stored full address wins over the card's short one
+    assert row["location"] == "ul. Prosta 5, Krzyki, Wrocław, dolnośląskie"
+    assert row["floor"] == "2/4"
+    assert row["describe"] == "Ładne"
+    assert row["urls"] == OFFER_URL
+    assert row["lift"] == "brak informacji"
+
+
+def test_build_summary_row_without_snapshot_or_price():
+    summary = dict.fromkeys(parser_module.SUMMARY_COLUMNS)
+    assert parser_module.build_summary_row(summary, OFFER_URL) is None
+    summary["prices"] = "1"
+    row = dict(zip(export_module.CSV_COLUMNS, parser_module.build_summary_row(summary, OFFER_URL)))
+    assert (row["location"], row["describe"], row["titles"]) == ("", "", "brak informacji")
+
+
+AD = {
+    "title": "Mieszkanie 3 pokojowe",
+    "advertiserType": "private",
+    "description": "<p>Ładne&nbsp;mieszkanie</p><p>Blisko &quot;parku&quot;</p>",
+    "location": LISTING_ITEM["location"],
+    "characteristics": [
+        {"key": "price", "value": "552000", "localizedValue": "552 000 zł"},
+        {"key": "m", "value": "54.5", "localizedValue": "54,50 m²"},
+        {"key": "price_per_m", "value": "10128.44", "localizedValue": "10 128 zł/m²"},
+        {"key": "rooms_num", "value": "3", "localizedValue": "3"},
+        {"key": "heating", "value": "urban", "localizedValue": "miejskie"},
+        {"key": "floor_no", "value": "floor_2", "localizedValue": "2"},
+        {"key": "building_floors_num", "value": "4", "localizedValue": "4"},
+        {"key": "market", "value": "secondary", "localizedValue": ""},
+    ],
+}
+
+
+def page_with_next_data(state, tail=b"<script>late()</script>"):
+    return (b'<html><body><h1>x</h1><script id="__NEXT_DATA__" type="application/json">' + json.dumps(state).encode("utf-8")
+            + b"</script>" + tail + b"</body></html>")
+
+
+@pytest.mark.parametrize("value, expected", [(552000.0, "552000"), ("10128.44", "10128"), ("10 128,6", "10129"), (None, None), ("abc", "abc")])
+def test_format_integer(value, expected):
+    assert parser_module.format_integer(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    (54.5, "54,5"),
+    (54.0, "54"),
+    ("54.50", "54,5"),
+    (0.1 + 0.2, "0,3"),
+    (38.456, "38,46"),
+    (-0.001, "0"),
+    (None, None),
+    ("brak informacji", "brak informacji"),
+])
+def test_format_decimal(value, expected):
+    assert parser_module.format_decimal(value) == expected
+
+
+def test_find_next_data():
+    state = listing_next_data([LISTING_ITEM])
+    assert parser_module.find_next_data(page_with_next_data(state)) == state
+
+
+@pytest.mark.parametrize("body", [
+    b"<html><body>no state</body></html>",
+    b'<html><script id="__NEXT_DATA__" type="application/json">{"props": </script></html>',
+    # Truncated download: the script never ends
+    b'<html><script id="__NEXT_DATA__" type="application/json">{"props": {}}',
+])
+def test_find_next_data_without_state(body):
+    assert parser_module.find_next_data(body) is None
+
+
+def test_find_offer_ad():
+    assert parser_module.find_offer_ad(page_with_next_data({"props": {"pageProps": {"ad": AD}}})) == AD
+    assert parser_module.find_offer_ad(page_with_next_data({"props": {"pageProps": {"ad": {"title": ""}}}})) is None
+    assert parser_module.find_offer_ad(page_with_next_data(listing_next_data([]))) is None
+
+
+def test_extract_ad_fields():
+    fields = parser_module.extract_ad_fields(AD)
+    assert fields["title"] == "Mieszkanie 3 pokojowe"
+    assert fields["price"] == "552000"
+    assert fields["price_per_m2"] == "10128"
+    assert fields["location"] == "ul. Prosta 5, Krzyki, Wrocław, dolnośląskie"
+    # Raw values for the numeric columns, displayed values for the others
+    assert fields["details"] == {"area": "54.5", "numbers_of_rooms": "3", "type_of_heating": "miejskie", "floor": "2/4",
+                                 "primary_secondary": "secondary", "seller": "prywatny"}
+    assert fields["describe"] == " Ładne\xa0mieszkanie  Blisko \"parku\" "
+
+
+def test_extract_ad_fields_hidden_price():
+    ad = dict(AD, hidePrice=True, characteristics=[characteristic for characteristic in AD["characteristics"] if characteristic["key"] not in ("price", "price_per_m")])
+    fields = parser_module.extract_ad_fields(ad)
+    assert (fields["price"], fields["price_per_m2"]) == ("", "")
+    assert parser_module.build_offer_row_from_ad(fields, OFFER_URL) is None
+
+
+def test_extract_ad_fields_missing_price_is_drift():
+    # Without hidePrice a missing price is a renamed key: the monitor must see it as missing
+    ad = dict(AD, characteristics=[characteristic for characteristic in AD["characteristics"] if characteristic["key"] != "price"])
+    fields = parser_module.extract_ad_fields(ad)
+    assert fields["price"] is None
+    with pytest.raises(ValueError, match="price"):
+        parser_module.build_offer_row_from_ad(fields, OFFER_URL)
+    monitor = parser_module.SelectorMonitor(sample_size=1, source="Embedded offer data")
+    monitor.update(fields)
+    with pytest.raises(parser_module.SelectorDriftError, match="^Embedded offer data drifted"):
+        monitor.check()
+
+
+def test_build_offer_row_from_ad_matches_the_html_row():
+    json_row = dict(zip(export_module.CSV_COLUMNS, parser_module.build_offer_row_from_ad(parser_module.extract_ad_fields(AD), OFFER_URL)))
+    html_row = dict(zip(export_module.CSV_COLUMNS, parser_module.build_offer_row(
+        parser_module.extract_offer_fields(BeautifulSoup(offer_page(), "html.parser")), OFFER_URL)))
+    for column in ["titles", "prices", "area", "price per square meter", "numbers_of_rooms", "urls", "type_of_heating", "floor", "seller"]:
+        assert json_row[column] == html_row[column], column
+    assert json_row["describe"] == " Ładnemieszkanie  Blisko  parku  "
+    assert json_row["lift"] == "brak informacji"
@@ -0,0 +1,194 @@
+import gzip
+import zlib
+
+import pytest
+import requests
+
+import web_scraper
+
+PAGE = b"<html><body>" + b"".join(b"<p>offer %d</p>" % index for index in range(5000)) + b"</body></html>"
+
+
+class FakeRaw:
+    """
+    The urllib3 response of a streamed request, serving 'data' in chunks of 'chunk_size' bytes.
+    """
+
+    def __init__(self, data: bytes, chunk_size: int):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.chunks_read = 0
+        self.closed = False
+
+    def stream(self, amount, decode_content=False):
+        for start in range(0, len(self.data), self.chunk_size):
+            self.chunks_read += 1
+            yield self.data[start:start + self.chunk_size]
+
+    def close(self):
+        self.closed = True
+
+    def release_conn(self):
+        pass
+
+
+def make_response(data: bytes, content_encoding: str="", content_type: str="text/html; charset=utf-8", chunk_size: int=1024):
+    response = requests.models.Response()
+    response.status_code = 200
+    response.url = "https://www.otodom.pl/pl/oferta/test-ID1"
+    response.headers["Content-Encoding"] = content_encoding
+    response.headers["Content-Type"] = content_type
+    response.raw = FakeRaw(data, chunk_size)
+    return response
+
+
+def raw_deflate(data: bytes):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decode_all(decoder, data: bytes, chunk_size: int=100):
+    decoded = b""
+    for start in range(0, len(data), chunk_size):
+        decoded += decoder.decode(data[start:start + chunk_size], 1 << 30)
+    return decoded
+
+
+@pytest.mark.parametrize("content_encoding", [None, "", "identity"])
+def test_get_decoder_without_encoding(content_encoding):
+    assert web_scraper.get_decoder(content_encoding) is None
+
+
+@pytest.mark.parametrize("content_encoding, encoded", [
+    ("gzip", gzip.compress(PAGE)),
+    ("x-gzip", gzip.compress(PAGE)),
+    ("deflate", zlib.compress(PAGE)),
+    ("deflate", raw_deflate(PAGE)),
+    ("GZIP", gzip.compress(PAGE)),
+], ids=["gzip", "x-gzip", "deflate", "raw-deflate", "uppercase"])
+def test_get_decoder(content_encoding, encoded):
+    assert decode_all(web_scraper.get_decoder(content_encoding), encoded) == PAGE
+
+
+@pytest.mark.parametrize("content_encoding, encoded", [
+    # Codings are listed in the order they were applied
+    ("gzip, deflate", zlib.compress(gzip.compress(PAGE))),
+    ("deflate,gzip", gzip.compress(zlib.compress(PAGE))),
+    ("identity, gzip", gzip.compress(PAGE)),
+], ids=["gzip-deflate", "deflate-gzip", "identity-gzip"])
+def test_get_decoder_chains(content_encoding, encoded):
+    assert decode_all(web_scraper.get_decoder(content_encoding), encoded) == PAGE
+
+
+@pytest.mark.skipif(web_scraper.brotli is None, reason="no bounded brotli decoder installed")
+def test_get_decoder_brotli_chain():
+    encoded = gzip.compress(web_scraper.brotli.compress(PAGE))
+    assert decode_all(web_scraper.get_decoder("br, gzip"), encoded) == PAGE
+
+
+def test_get_decoder_unsupported():
+    with pytest.raises(Exception, match="Unsupported Content-Encoding"):
+        web_scraper.get_decoder("gzip, compress")
+
+
+def test_decoder_output_is_bounded():
+    decoder = web_scraper.get_decoder("gzip, deflate")
+    encoded = zlib.compress(gzip.compress(PAGE))
+    decoded = decoder.decode(encoded, 1000)
+    assert len(decoded) <= 1000
+    assert decoder.pending
+    while decoder.pending:
+        decoded += decoder.decode(b"", 1000)
+    assert decoded == PAGE
+
+
+@pytest.mark.parametrize("content_encoding, encoded", [("", PAGE), ("gzip", gzip.compress(PAGE)), ("gzip, deflate", zlib.compress(gzip.compress(PAGE)))],
+                         ids=["identity", "gzip", "gzip-deflate"])
+def test_read_body(content_encoding, encoded):
+    response = make_response(encoded, content_encoding, "text/html; charset=ISO-8859-2")
+    assert web_scraper.read_body(response, 10 * len(PAGE)) == PAGE
+    assert response.content == PAGE
+    assert response.encoding == "ISO-8859-2"
+    assert not response.truncated
+    assert response.raw.closed
+
+
+def test_read_body_defaults_to_utf8():
+    response = make_response(PAGE, content_type="text/html")
+    web_scraper.read_body(response, len(PAGE))
+    assert response.encoding == "utf-8"
+
+
+def test_read_body_truncates_a_decompression_bomb():
+    bomb = gzip.compress(b"\0" * (50 * 1024 * 1024), 9)
+    response = make_response(bomb, "gzip", chunk_size=16 * 1024)
+    body = web_scraper.read_body(response, 100000)
+    assert len(body) == 100000
+    assert response.truncated
+    # Reading stopped at the first chunk, which alone expands far past the limit
+    assert response.raw.chunks_read == 1
+
+
+def test_read_body_stops_after_the_stop_markers():
+    page = b"<html>" + b"x" * 5000 + b'<script id="__NEXT_DATA__">{}</script>' + b"y" * 100000
+    response = make_response(page, chunk_size=1000)
+    body = web_scraper.read_body(response, len(page), stop_markers=(b'id="__NEXT_DATA__"', b"</script>"))
+    assert b"{}</script>" in body
+    # Reading stopped with the chunk holding the end of the script
+    assert len(body) == 6000
+    assert not response.truncated
+
+
+def test_read_body_stop_markers_must_arrive_in_order():
+    # The first </script> comes before the marker, reading continues to the one after it
+    page = b"<script>a</script>" + b"x" * 3000 + b'<script id="__NEXT_DATA__">{}</script>' + b"y" * 3000
+    response = make_response(page, chunk_size=7)
+    body = web_scraper.read_body(response, len(page), stop_markers=(b'id="__NEXT_DATA__"', b"</script>"))
+    assert b'{}</script>' in body
+    assert len(body) < len(page)
+
+
+@pytest.fixture
+def proxy_db(db, monkeypatch):
+    for table_name in ("proxies_unchecked", "proxies_working", "proxies_not_working"):
+        db.create_table(table_name, "id INTEGER PRIMARY KEY AUTOINCREMENT", "ip_address")
+    monkeypatch.setattr(web_scraper, "db", db)
+    monkeypatch.setattr(web_scraper, "REPLAY_DIR", None)
+    monkeypatch.setattr(web_scraper, "CORPUS_DIR", None)
+    monkeypatch.setattr(web_scraper, "proxy_cooldowns", {})
+    monkeypatch.setattr(web_scraper, "proxy_stats", {})
+    return db
+
+
+def serve(monkeypatch, bodies, proxy="10.0.0.1:8080"):
+    """
+    Make 'get' return 200 responses with 'bodies' in turn, fetched through 'proxy'.
+    """
+    bodies = iter(bodies)
+    def get(url, requested_proxy=None, stop_markers=None, max_bytes=None):
+        response = requests.models.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = next(bodies)
+        response.proxy = proxy
+        return response
+    monkeypatch.setattr(web_scraper, "get", get)
+
+
+def test_get_page_quarantines_a_proxy_serving_a_captcha(proxy_db, monkeypatch):
+    captcha_page = b"<html>" + b" " * 5000 + b"cf-chl-opt</html>"
+    listing_page = b"<html>" + b'<a href="/pl/oferta/a-ID1">a</a>' * 200 + b"</html>"
+    serve(monkeypatch, [captcha_page, listing_page])
+    response = web_scraper.get_page("https://www.otodom.pl/pl/wyniki", page_type="listing")
+    assert response.content == listing_page
+    # The retry went through the same proxy: it served the listing, so it is working, but stays quarantined
+    assert proxy_db.get_column("proxies_working", "ip_address") == ["10.0.0.1:8080"]
+    assert web_scraper.is_quarantined("10.0.0.1:8080")
+
+
+def test_get_page_sets_a_proxy_serving_captchas_not_working(proxy_db, monkeypatch):
+    serve(monkeypatch, [b"<html>" + b" " * 5000 + b"_px3</html>"] * 9)
+    with pytest.raises(NameError):
+        web_scraper.get_page("https://www.otodom.pl/pl/oferta/a-ID1", page_type="offer")
+    assert proxy_db.get_column("proxies_working", "ip_address") == []
+    assert "10.0.0.1:8080" in proxy_db.get_column("proxies_not_working", "ip_address")
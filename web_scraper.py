@@ -1,32 +1,89 @@
 from bs4 import BeautifulSoup
 import requests
 from datetime import datetime
-import csv
 import random
 import time
+import sys
+import os.path
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 import logging 
 import db_module
+import export_module
+import offer_store_module
+import fingerprint_module
+import classifier_module
+import parser_module
+import profiling_module
+import proxy_pool_module
+
+# Bounded brotli decoding needs Decompressor.process(data, output_buffer_limit) and can_accept_more_data(),
+# which Google's brotli and brotlicffi have since 1.2. brotlipy (also imported as "brotli") and older
+# releases don't, so "br" is then neither advertised nor decoded.
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+if brotli is not None and not hasattr(getattr(brotli, "Decompressor", None), "can_accept_more_data"):
+    brotli = None
+BROTLI_REQUIREMENT = "brotli>=1.2 or brotlicffi>=1.2"
 
-logging.basicConfig(filename='std.log', filemode='w', format='%(asctime)s - %(levelname)s - %(message)s', level=logging.DEBUG, encoding='utf-8')
 logger=logging.getLogger()
 
-#Connect to database
-db = db_module.Database("web_scraper_data_base")
-if db.check_table_exists("proxies_unchecked"):
-    db.drop_table("proxies_unchecked")
-db.create_table("proxies_unchecked", "id INTEGER PRIMARY KEY AUTOINCREMENT", "ip_address")
-file_url = "proxy_list.txt"
-#Append proxies to data base
-db_module.download_proxies_from_file(db, file_url)
-
-
+# Connected by 'setup_database'
+db = None
+
+# Defaults of the settings in scraper.ini, see 'configure'
+DATABASE_NAME = "web_scraper_data_base"
+PROXY_FILE = "proxy_list.txt"
+LOG_FILE = "std.log"
+#Here modify adress if want scrap from other localization    
+SEARCH_URL = "https://www.otodom.pl/pl/wyniki/sprzedaz/mieszkanie/dolnoslaskie/wroclaw/wroclaw/wroclaw?limit=36&ownerTypeSingleSelect=ALL&by=DEFAULT&direction=DESC&viewType=listing"
+OUTPUT_FILE_PREFIX = "oto_dom_wroclaw_"
+# "full" fetches every offer page, "summary" writes the listing card summaries of known offers and
+# only fetches the offer pages of new ones (see parser_module.extract_listing_summaries)
+SCRAPE_MODE = "full"
 VALID_STATUSES = [200, 301, 302, 307, 404]  
+OUTPUT_FORMAT = "csv" # "csv", "parquet" or "arrow" (see export_module)
+ROW_GROUP_SIZE = 5000
+OUTPUT_COMPRESSION = "zstd"
+REQUEST_TIMEOUT = 4
+CHECK_URL = "http://ident.me/"
+CONCURRENCY = 8 # number of proxies checked in parallel
+MIN_WORKING_PROXIES = 15 # check new proxies when fewer working proxies are available
+TARGET_WORKING_PROXIES = 50 # don't check new proxies when this many are working
+UNCHECKED_BATCH = 100 # unchecked proxies checked per round
+NOT_WORKING_BATCH = 20 # not working proxies re-checked per round
+# Proxy pool state is saved there on shutdown and every SNAPSHOT_INTERVAL seconds (see proxy_pool_module)
+SNAPSHOT_FILE = "proxy_pool.json.gz"
+SNAPSHOT_INTERVAL = 60
+SNAPSHOT_MAX_AGE = 24 * 3600 # older snapshots are ignored (cold start)
+WARM_START_PROBES = 20 # best working proxies of the snapshot re-checked on a warm start
+MAX_BODY_BYTES = 5 * 1024 * 1024 # response bodies are cut off after this many decoded bytes
+STREAM_CHUNK_SIZE = 16 * 1024
+# Only advertise brotli if we can decode it
+ACCEPT_ENCODING = 'gzip, deflate, br' if brotli is not None else 'gzip, deflate'
+QUARANTINE_SECONDS = 600 # cooldown of a proxy which got a block/captcha page
+EMPTY_LISTING_RETRIES = 2
+# Abort the crawl if, after the first SELECTOR_SAMPLE_SIZE offers, a required field is found on fewer
+# than MIN_SELECTOR_HIT_RATE of them (see parser_module.SelectorMonitor)
+SELECTOR_SAMPLE_SIZE = 36
+MIN_SELECTOR_HIT_RATE = 0.5
+# If set, fetched pages are stored there (CORPUS_DIR/offer, CORPUS_DIR/listing) for 'python parser_module.py CORPUS_DIR/offer'
+CORPUS_DIR = None
+# If set, pages are served from this corpus directory instead of the network (offline replay, e.g. for --profile)
+REPLAY_DIR = None
+CHARSET_REGEX = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
 user_agent_list = [ 
                     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36', 
                     'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36', 
                     'Mozilla/5.0 (Macintosh; Intel Mac OS X 13_1) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.1 Safari/605.1.15', 
                     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36',
-                    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36'
+                    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36',
                     'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/116.0',
                     'Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/115.0',
                     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36 Edg/115.0.1901.188',
@@ -46,12 +103,255 @@ referer_list = ['https://www.polsatnews.pl/',
                 'https://www.rp.pl/nieruchomosci/art39048221-rzadowy-kredyt-2-nakreca-ceny-mieszkan-do-rekordowych-poziomow'
                ]
 
+# Consistent header profiles pinned per proxy, see fingerprint_module
+fingerprints = fingerprint_module.FingerprintEngine(user_agent_list, referer_list, accept_encoding=ACCEPT_ENCODING)
+# proxy -> time (time.time()) until which the proxy is quarantined
+proxy_cooldowns = {}
+# proxy -> proxy_pool_module.ProxyStats
+proxy_stats = {}
+# Set by 'setup_pool'
+warm_started = False
+imported_proxy_file_mtime = None
+last_snapshot_time = 0.0
+
+
+def configure(settings):
+    """
+    Apply settings loaded by config_module.load_settings to the module constants.
+
+    Args:
+    settings (dict): Settings as {section: {key: value}}.
+    """
+    global SEARCH_URL, OUTPUT_FILE_PREFIX, SCRAPE_MODE, SELECTOR_SAMPLE_SIZE, MIN_SELECTOR_HIT_RATE, CORPUS_DIR, REPLAY_DIR
+    global REQUEST_TIMEOUT, MAX_BODY_BYTES, VALID_STATUSES, QUARANTINE_SECONDS, CONCURRENCY
+    global DATABASE_NAME, PROXY_FILE, CHECK_URL, MIN_WORKING_PROXIES, TARGET_WORKING_PROXIES, UNCHECKED_BATCH, NOT_WORKING_BATCH
+    global SNAPSHOT_FILE, SNAPSHOT_INTERVAL, SNAPSHOT_MAX_AGE, WARM_START_PROBES
+    global OUTPUT_FORMAT, ROW_GROUP_SIZE, OUTPUT_COMPRESSION
+    scrape, network, proxies, output = settings["scrape"], settings["network"], settings["proxies"], settings["output"]
+
+    SEARCH_URL = scrape["url"]
+    OUTPUT_FILE_PREFIX = scrape["output_file_prefix"]
+    SCRAPE_MODE = scrape["mode"]
+    SELECTOR_SAMPLE_SIZE = scrape["selector_sample_size"]
+    MIN_SELECTOR_HIT_RATE = scrape["min_selector_hit_rate"]
+    CORPUS_DIR = scrape["corpus_dir"] or None
+    REPLAY_DIR = scrape["replay_dir"] or None
+
+    REQUEST_TIMEOUT = network["timeout"]
+    MAX_BODY_BYTES = network["max_body_bytes"]
+    VALID_STATUSES = network["valid_statuses"]
+    QUARANTINE_SECONDS = network["quarantine_seconds"]
+    CONCURRENCY = network["concurrency"]
+
+    DATABASE_NAME = proxies["database"]
+    PROXY_FILE = proxies["proxy_file"]
+    CHECK_URL = proxies["check_url"]
+    MIN_WORKING_PROXIES = proxies["min_working"]
+    TARGET_WORKING_PROXIES = proxies["target_working"]
+    UNCHECKED_BATCH = proxies["unchecked_batch"]
+    NOT_WORKING_BATCH = proxies["not_working_batch"]
+    SNAPSHOT_FILE = proxies["snapshot_file"] or None
+    SNAPSHOT_INTERVAL = proxies["snapshot_interval"]
+    SNAPSHOT_MAX_AGE = proxies["snapshot_max_age"]
+    WARM_START_PROBES = proxies["warm_start_probes"]
+
+    OUTPUT_FORMAT = output["format"]
+    ROW_GROUP_SIZE = output["row_group_size"]
+    OUTPUT_COMPRESSION = None if output["compression"] == "none" else output["compression"]
+
+
+def setup_logging(log_file: str=LOG_FILE):
+    """
+    Log to 'log_file', overwriting it.
+
+    Args:
+    log_file (str, optional): The log file path.
+    """
+    logging.basicConfig(filename=log_file, filemode='w', format='%(asctime)s - %(levelname)s - %(message)s', level=logging.DEBUG, encoding='utf-8')
+
+
+def setup_database(import_proxies: bool=True):
+    """
+    Connect to the DATABASE_NAME database and create the proxy tables if needed.
+
+    Args:
+    import_proxies (bool, optional): Recreate the 'proxies_unchecked' table from PROXY_FILE.
+
+    Returns:
+    db_module.Database: The connected database, also stored in the module 'db' variable.
+    """
+    global db
+    #Connect to database
+    db = db_module.Database(DATABASE_NAME)
+    if import_proxies:
+        if db.check_table_exists("proxies_unchecked"):
+            db.drop_table("proxies_unchecked")
+    for table_name in ("proxies_unchecked", "proxies_working", "proxies_not_working"):
+        if not db.check_table_exists(table_name):
+            db.create_table(table_name, "id INTEGER PRIMARY KEY AUTOINCREMENT", "ip_address")
+    if import_proxies:
+        #Append proxies to data base
+        db_module.download_proxies_from_file(db, PROXY_FILE)
+    return db
+
+
+def setup_pool(import_proxies: bool=True, warm_start: bool=True, probes: int=None):
+    """
+    Connect to the database and prepare the proxy pool, warm starting from the pool snapshot if possible.
+
+    A snapshot saved less than SNAPSHOT_MAX_AGE seconds ago restores the proxy statistics and cooldowns.
+    The best 'probes' of its working proxies are re-checked (in parallel) instead of checking unchecked proxies
+    before the first request. Its other working proxies may be stale, so they are restored as unchecked and
+    only used once checked. The proxy file is only re-imported if it changed.
+
+    Args:
+    import_proxies (bool, optional): Re-import PROXY_FILE (see 'setup_database').
+    warm_start (bool, optional): Use the pool snapshot.
+    probes (int, optional): The number of proxies re-checked on a warm start, WARM_START_PROBES by default.
+
+    Returns:
+    bool: True if the pool was warm started from a snapshot.
+    """
+    global warm_started, imported_proxy_file_mtime
+    snapshot = None
+    if warm_start and SNAPSHOT_FILE is not None and REPLAY_DIR is None:
+        snapshot = proxy_pool_module.load_snapshot(SNAPSHOT_FILE, SNAPSHOT_MAX_AGE)
+
+    proxy_file_mtime = proxy_pool_module.get_file_mtime(PROXY_FILE)
+    if snapshot is not None and snapshot["proxy_file_mtime"] == proxy_file_mtime:
+        # 'proxies_unchecked' still holds the rest of this file
+        import_proxies = False
+    setup_database(import_proxies)
+    imported_proxy_file_mtime = proxy_file_mtime if import_proxies or snapshot is None else snapshot["proxy_file_mtime"]
+
+    warm_started = snapshot is not None
+    if snapshot is None:
+        return False
+
+    proxy_stats.update(snapshot["stats"])
+    proxy_cooldowns.update(snapshot["cooldowns"])
+
+    if probes is None:
+        probes = WARM_START_PROBES
+    candidates = [proxy for proxy in snapshot["working"] + get_available_proxies(db) if not is_quarantined(proxy)]
+    best_proxies = proxy_pool_module.top_proxies(candidates, proxy_stats, probes)
+    print(f"WARM START: {len(snapshot['working'])} WORKING PROXIES IN SNAPSHOT, RE-CHECKING {len(best_proxies)}")
+    logger.info(f"WARM START FROM {SNAPSHOT_FILE}, RE-CHECKING {len(best_proxies)} PROXIES")
+    if best_proxies:
+        check_proxy_list(best_proxies)
+
+    # The other snapshot proxies are not trusted until 'check_proxies' has checked them again
+    probed_proxies = set(best_proxies)
+    known_proxies = set(db.get_column("proxies_working", "ip_address")) | set(db.get_column("proxies_unchecked", "ip_address"))
+    for proxy in snapshot["working"]:
+        if proxy not in probed_proxies and proxy not in known_proxies:
+            reset_proxy(proxy)
+    return True
+
+
+def save_pool_snapshot():
+    """
+    Save the working proxies, proxy statistics and cooldowns to SNAPSHOT_FILE (not in replay mode).
+
+    Statistics of proxies which are no longer in any proxy table (e.g. after a new proxy file was imported)
+    are dropped first, so 'proxy_stats' doesn't grow without bound.
+    """
+    global last_snapshot_time
+    if SNAPSHOT_FILE is None or REPLAY_DIR is not None or db is None:
+        return
+    with profiling_module.stage("snapshot"):
+        pool_proxies = set()
+        for table_name in ("proxies_unchecked", "proxies_working", "proxies_not_working"):
+            pool_proxies.update(db.get_column(table_name, "ip_address"))
+        for proxy in [proxy for proxy in proxy_stats if proxy not in pool_proxies]:
+            del proxy_stats[proxy]
+        proxy_pool_module.save_snapshot(SNAPSHOT_FILE, db.get_column("proxies_working", "ip_address"), proxy_stats, proxy_cooldowns, imported_proxy_file_mtime)
+    last_snapshot_time = time.time()
+    logger.info("SAVED PROXY POOL SNAPSHOT: " + SNAPSHOT_FILE)
+
+
+def maybe_save_pool_snapshot():
+    """
+    Save the pool snapshot if the last one is more than SNAPSHOT_INTERVAL seconds old.
+    """
+    if time.time() - last_snapshot_time >= SNAPSHOT_INTERVAL:
+        save_pool_snapshot()
+
+
+def record_proxy_result(proxy, success: bool):
+    """
+    Update the statistics (used to rank proxies on a warm start) of a proxy after a request.
+
+    Args:
+    proxy (str): The proxy used for the request.
+    success (bool): Whether the request got a valid, not blocked response.
+    """
+    if REPLAY_DIR is not None:
+        return
+    if proxy not in proxy_stats:
+        proxy_stats[proxy] = proxy_pool_module.ProxyStats()
+    proxy_stats[proxy].record(success)
+
+
+class PageSkipped(Exception):
+    """
+    Raised by 'get_page' for pages which should not be parsed nor retried (e.g. a removed offer).
+    """
+
+
+def quarantine_proxy(proxy, cooldown: int=None):
+    """
+    Quarantine a proxy which got a block page, so it isn't used nor re-checked for 'cooldown' seconds.
+
+    Args:
+    proxy (str): The blocked proxy.
+    cooldown (int, optional): The quarantine duration in seconds, QUARANTINE_SECONDS by default.
+    """
+    if cooldown is None:
+        cooldown = QUARANTINE_SECONDS
+    proxy_cooldowns[proxy] = time.time() + cooldown
+    print("QUARANTINED PROXY: " + proxy)
+    logger.info("QUARANTINED PROXY: " + proxy)
+
+
+def is_quarantined(proxy):
+    """
+    Check if a proxy is in quarantine, releasing it if its cooldown has expired.
+
+    Args:
+    proxy (str): The proxy to check.
+
+    Returns:
+    bool: True if the proxy is quarantined.
+    """
+    until = proxy_cooldowns.get(proxy)
+    if until is None:
+        return False
+    if until <= time.time():
+        del proxy_cooldowns[proxy]
+        return False
+    return True
+
+
+def get_available_proxies(db):
+    """
+    Get the working proxies which are not quarantined.
+
+    Args:
+    db (db_module): An instance of the db_module class providing access to the database.
+
+    Returns:
+    list: The proxies.
+    """
+    return [proxy for proxy in db.get_column("proxies_working", "ip_address") if not is_quarantined(proxy)]
+
+
 def get_random_proxy(db): 
     """
     Get a random proxy from the working proxies in the database.
 
     This function checks the number of active proxies in the 'proxies_working' table of the given database.
-    If the number of active proxies is less than 15, it triggers a proxy-checking mechanism by calling the 'check_proxies' function.
+    Quarantined proxies are skipped. If the number of active proxies is less than MIN_WORKING_PROXIES, it triggers a proxy-checking mechanism by calling the 'check_proxies' function.
 
     Args:
     db (db_module): An instance of the db_module class providing access to the database.
@@ -62,18 +362,16 @@ def get_random_proxy(db):
     Raises:
     Exception: If no working proxies are available in the 'proxies_working' table.
     """
-    number_of_active_proxies = db.get_row_count("proxies_working")
+    available_proxies = get_available_proxies(db)
 
-    if number_of_active_proxies < 15 :
+    if len(available_proxies) < MIN_WORKING_PROXIES :
         check_proxies(db)
-    
-    available_proxies = db.get_column("proxies_working", "ip_address")
-    available_proxies = tuple(available_proxies)
+        available_proxies = get_available_proxies(db)
     
     if not available_proxies: 
         raise Exception("no proxies available") 
     
-    number_of_active_proxies = db.get_row_count("proxies_working")
+    number_of_active_proxies = len(available_proxies)
     print("REMAINING PROXIES: " + str(number_of_active_proxies))  
     info_str =  "REMAINING PROXIES: " + str(number_of_active_proxies)
     logger.info(info_str) 
@@ -81,31 +379,187 @@ def get_random_proxy(db):
 
 
 
-def get(url, proxy: str=None): 
+class CodingDecoder:
+    """
+    Incremental decoder of one content coding ("gzip", "deflate" or "br") whose output per call is bounded,
+    so a small compressed chunk can't expand into an unbounded amount of memory (decompression bomb).
+
+    Input which could not be decoded within the bound is kept until the next call, see 'pending'.
+    """
+
+    def __init__(self, coding: str):
+        if coding not in ("gzip", "x-gzip", "deflate", "br"):
+            raise Exception("Unsupported Content-Encoding: " + coding)
+        if coding == "br" and brotli is None:
+            raise Exception("Unsupported Content-Encoding: br (install " + BROTLI_REQUIREMENT + ")")
+        self.coding = coding
+        self.decompressor = None
+        if coding in ("gzip", "x-gzip"):
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif coding == "br":
+            self.decompressor = brotli.Decompressor()
+        # Brotli input not passed to the decompressor yet, it only accepts more once its output is drained
+        self.brotli_input = b""
+
+    def decode(self, data: bytes, max_length: int):
+        """
+        Decode the next chunk of the body.
+
+        Args:
+        data (bytes): The next encoded bytes, may be empty to continue decoding pending input.
+        max_length (int): The maximum number of decoded bytes to return (brotli may exceed it by one output buffer).
+
+        Returns:
+        bytes: The decoded bytes.
+        """
+        if self.coding == "br":
+            self.brotli_input += data
+            if not self.decompressor.can_accept_more_data():
+                return self.decompressor.process(b"", output_buffer_limit=max_length)
+            data, self.brotli_input = self.brotli_input, b""
+            return self.decompressor.process(data, output_buffer_limit=max_length)
+        if self.decompressor is None:
+            if not data:
+                return b""
+            # "deflate" is zlib wrapped by the spec, but some servers send raw deflate
+            wbits = zlib.MAX_WBITS if data[:1] == b"\x78" else -zlib.MAX_WBITS
+            self.decompressor = zlib.decompressobj(wbits)
+        return self.decompressor.decompress(self.decompressor.unconsumed_tail + data, max_length)
+
+    @property
+    def pending(self):
+        # True if the decoder holds input it could not decode within the last 'max_length'
+        if self.coding == "br":
+            return bool(self.brotli_input) or not self.decompressor.can_accept_more_data()
+        return self.decompressor is not None and bool(self.decompressor.unconsumed_tail)
+
+
+class BodyDecoder:
+    """
+    Incremental, bounded decoder of a Content-Encoding header value (see 'CodingDecoder').
+
+    Multiple codings (e.g. "gzip, br") are listed in the order they were applied, so they are decoded in reverse order.
+    """
+
+    def __init__(self, content_encoding: str):
+        codings = [coding.strip() for coding in (content_encoding or "").lower().split(",")]
+        self.decoders = [CodingDecoder(coding) for coding in reversed(codings) if coding not in ("", "identity")]
+
+    def decode(self, data: bytes, max_length: int):
+        for decoder in self.decoders:
+            data = decoder.decode(data, max_length)
+        return data
+
+    @property
+    def pending(self):
+        return any(decoder.pending for decoder in self.decoders)
+
+
+def get_decoder(content_encoding: str):
+    """
+    Get an incremental decoder for a Content-Encoding header value.
+
+    Args:
+    content_encoding (str): The Content-Encoding of the response ("gzip", "deflate", "br", a list of them or empty).
+
+    Returns:
+    BodyDecoder: The decoder, or None if the body is not encoded.
+
+    Raises:
+    Exception: If an encoding is not supported (e.g. "br" without BROTLI_REQUIREMENT installed).
+    """
+    decoder = BodyDecoder(content_encoding)
+    return decoder if decoder.decoders else None
+
+
+def read_body(response, max_bytes: int=MAX_BODY_BYTES, stop_markers=None):
+    """
+    Read a streamed response body, decoding gzip/deflate/brotli incrementally.
+
+    Reading stops when the decoded body exceeds 'max_bytes' or when all 'stop_markers' have arrived in order,
+    and the connection is closed, so the rest of the page is never downloaded. Each decoding step is bounded by
+    the remaining budget, so a highly compressed chunk can't expand past 'max_bytes' in memory.
+    The decoded body is stored as response.content and the charset declared in the Content-Type
+    header (utf-8 if none) as response.encoding, so response.text does no charset sniffing.
+
+    Args:
+    response (requests.Response): A response of a request made with stream=True.
+    max_bytes (int): The maximum number of decoded bytes to read.
+    stop_markers (tuple, optional): Byte strings, e.g. (b'id="__NEXT_DATA__"', b"</script>"): stop reading
+    once each of them has arrived after the previous one.
+
+    Returns:
+    bytes: The decoded (possibly truncated) body.
+    """
+    decoder = get_decoder(response.headers.get('Content-Encoding'))
+    body = bytearray()
+    response.truncated = False
+    # Index of the next stop marker to find and the position from which to search it
+    marker_index = 0
+    search_start = 0
+    try:
+        for chunk in response.raw.stream(STREAM_CHUNK_SIZE, decode_content=False):
+            if decoder is None:
+                body += chunk
+            else:
+                # Decode at most one byte more than the remaining budget, then drain the decoder's
+                # pending input within the budget, so memory stays bounded however well the chunk compresses
+                body += decoder.decode(chunk, max_bytes - len(body) + 1)
+                while decoder.pending and len(body) <= max_bytes:
+                    body += decoder.decode(b"", max_bytes - len(body) + 1)
+            if len(body) > max_bytes:
+                del body[max_bytes:]
+                response.truncated = True
+                print("RESPONSE BODY TRUNCATED AT " + str(max_bytes) + " BYTES")
+                logger.info("RESPONSE BODY TRUNCATED: " + response.url)
+                break
+            while stop_markers and marker_index < len(stop_markers):
+                found = body.find(stop_markers[marker_index], search_start)
+                if found == -1:
+                    search_start = max(search_start, len(body) - len(stop_markers[marker_index]) + 1)
+                    break
+                search_start = found + len(stop_markers[marker_index])
+                marker_index += 1
+            if stop_markers and marker_index == len(stop_markers):
+                break
+    finally:
+        response.close()
+
+    charset = CHARSET_REGEX.search(response.headers.get('Content-Type', ''))
+    response.encoding = charset.group(1) if charset else 'utf-8'
+    response._content = bytes(body)
+    response._content_consumed = True
+    return response._content
+
+
+def get(url, proxy: str=None, stop_markers=None, max_bytes: int=None): 
     """
     Perform an HTTP GET request to the specified URL with an optional rotating proxy.
 
     If no proxy is provided, a random proxy is selected using the 'get_random_proxy' function from the given database.
+    If REPLAY_DIR is set, the page is served from the stored corpus instead (see 'get_replayed').
+    Request headers come from the header profile pinned to the proxy (see fingerprint_module).
 
     Args:
     url (str): The URL to which the GET request should be made.
     proxy (str, optional): The proxy to be used for the request. If not provided, a random proxy will be selected.
+    stop_markers (tuple, optional): Stop downloading the body once these byte strings have arrived (see 'read_body').
+    max_bytes (int, optional): The maximum number of decoded body bytes to download, MAX_BODY_BYTES by default.
 
     Returns:
-    requests.Response: The response object from the GET request.
+    requests.Response: The response object from the GET request, with the body already read.
 
     Raises:
     Exception: If an exception occurs during the request or if the response status code is not in the VALID_STATUSES.
     """    
+    if REPLAY_DIR is not None:
+        return get_replayed(url)
+    if max_bytes is None:
+        max_bytes = MAX_BODY_BYTES
     if not proxy: 
-        proxy = get_random_proxy(db)   
-    user_agent = random.choice(user_agent_list)
-    referer = random.choice(referer_list)
-    hdr = {'User-Agent': user_agent,
-           'Accept-Language': 'pl-PL,pl',
-           'Accept-Encoding': 'gzip, deflate, br',
-           'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-           'Referer': referer}
+        with profiling_module.stage("proxy"):
+            proxy = get_random_proxy(db)   
+    hdr = fingerprints.headers_for(proxy)
     try: 
         # Send proxy requests to the final URL 
         print( "USE PROXY: " + proxy)
@@ -113,93 +567,147 @@ def get(url, proxy: str=None):
         info_str = "USE PROXY: " + proxy + "\n" + "REMAINING PROXIES: " 
         logger.info(info_str) 
         
-        response = requests.get(url, headers=hdr, proxies={'http': f"http://{proxy}"}, timeout=4) 
+        with profiling_module.stage("fetch"):
+            response = requests.get(url, headers=hdr, proxies={'http': f"http://{proxy}"}, timeout=REQUEST_TIMEOUT, stream=True) 
+            read_body(response, max_bytes, stop_markers)
+        response.proxy = proxy
         print(response.status_code)
 
-        if response.status_code in VALID_STATUSES: # valid proxy 
-            set_working(proxy)
+        # The proxy is only moved to the working / not working table by the caller ('get_page', 'check_proxy'),
+        # since a valid status can still be a captcha or block page
+        if response.status_code in VALID_STATUSES:
             print("RESPONSE STATUS: OK ")
             logger.info("RESPONSE STATUS: OK ")
         else: 
-            set_not_working(proxy)
             print("RESPONSE STATUS: FAILED <<<<<<<<<<<<<<<<<< ")
             logger.info("RESPONSE STATUS: FAILED <<<<<<<<<<<<<<<<<< ")
         return response
         
     except Exception as e: 
         print("Exception: ", e)
+        record_proxy_result(proxy, False)
         set_not_working(proxy)
         print("RESPONSE STATUS: FAILED ")
         logger.info("RESPONSE STATUS: FAILED  ")
    
+def get_replayed(url):
+    """
+    Serve a page stored in the REPLAY_DIR corpus as if it was fetched, for reproducible offline runs.
+
+    Args:
+    url (str): The requested URL.
+
+    Returns:
+    requests.Response: A 200 response with the stored page, or a 404 response if the page is not stored.
+    """
+    response = requests.models.Response()
+    response.url = url
+    response.proxy = "replay"
+    response.encoding = 'utf-8'
+    path = parser_module.find_in_corpus(REPLAY_DIR, url)
+    if path is None:
+        response.status_code = 404
+        response._content = b""
+    else:
+        with open(path, 'rb') as file:
+            response._content = file.read()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'text/html; charset=utf-8'
+    return response
+
+@profiling_module.stage("proxy_check")
 def check_proxies(db):
     """
     Check the status of proxies in the database and perform checks on a subset of unchecked and not working proxies.
 
-    If the 'proxies_working' table exists and has fewer than 50 active proxies, this function will check a subset of
-    unchecked and not working proxies. If the 'proxies_working' table does not exist, it will be created, and checks
-    will be performed on unchecked and not working proxies.
+    If the 'proxies_working' table exists and has fewer than TARGET_WORKING_PROXIES active proxies, this function will check
+    up to UNCHECKED_BATCH unchecked and NOT_WORKING_BATCH not working proxies. If the 'proxies_working' table does not exist,
+    it will be created, and checks will be performed on unchecked and not working proxies.
+    Proxies are checked CONCURRENCY at a time (see 'check_proxy_list').
 
     Args:
     db (db_module): An instance of the db_module class providing access to the database.
     """    
     if db.check_table_exists("proxies_working"):
         number_of_active_proxies = db.get_row_count("proxies_working")
-        if number_of_active_proxies < 50 :
+        if number_of_active_proxies < TARGET_WORKING_PROXIES :
             print("Now should check some number of  unchecked (and some not working) proxies")
             #Code for checking random proxies
             if not db.is_table_empty("proxies_unchecked"):
-
-                unchecked_id_list = db.get_column("proxies_unchecked", "id")
-
-                if db.get_row_count("proxies_unchecked") > 100: 
-
-                    unchecked_id_list = unchecked_id_list[0:100]
-
-                for proxy_id in unchecked_id_list:
-
-                    proxy = db.get_row_by_id(table_name= "proxies_unchecked", id_value = proxy_id)[1]
-                    check_proxy(proxy)
+                unchecked_proxies = db.get_column("proxies_unchecked", "ip_address")[0:UNCHECKED_BATCH]
+                check_proxy_list(unchecked_proxies)
 
             if not db.is_table_empty("proxies_not_working"):
 
-                if db.get_row_count("proxies_not_working") > 20: 
-
-                    not_working_id_list = db.get_column("proxies_not_working", "id")
-                    not_working_id_list = random.choices(not_working_id_list, k=20)
-
-                    for proxy_id in not_working_id_list:
+                if db.get_row_count("proxies_not_working") > NOT_WORKING_BATCH: 
 
-                        proxy = db.get_row_by_id(table_name= "proxies_not_working", id_value = proxy_id)[1]
-                        check_proxy(proxy)
+                    not_working_proxies = db.get_column("proxies_not_working", "ip_address")
+                    not_working_proxies = random.choices(not_working_proxies, k=NOT_WORKING_BATCH)
+                    check_proxy_list(not_working_proxies)
 
-        else:
-            working_proxies_list  = db.get_column("proxies_working", "ip_address")
     else: 
         print("We have problem! Cant find 'proxies_working' table!")
         db.create_table("proxies_working", "id INTEGER PRIMARY KEY AUTOINCREMENT", "ip_address")
 
         if not db.is_table_empty("proxies_unchecked"):
-
-            unchecked_id_list = db.get_column("proxies_unchecked", "id")
-    
-            for proxy_id in unchecked_id_list:
-
-                proxy = db.get_row_by_id(table_name= "proxies_unchecked", id_value = proxy_id)[1]
-                check_proxy(proxy)
+            check_proxy_list(db.get_column("proxies_unchecked", "ip_address"))
 
         elif not db.is_table_empty("proxies_not_working"):
-            not_working_id_list = db.get_column("proxies_not_working", "id")
-            for proxy_id in not_working_id_list:
-
-                proxy = db.get_row_by_id(table_name= "proxies_not_working", id_value = proxy_id)[1]
-                check_proxy(proxy)        
+            check_proxy_list(db.get_column("proxies_not_working", "ip_address"))
         else:
             raise Exception("Sorry, there's no not_working, unchecked or working proxy. Something went wrong!")
 
+def probe_proxy(proxy, headers):
+    """
+    Make a test request to CHECK_URL through a proxy without touching the database, so it can run in a thread.
+
+    Args:
+    proxy (str): The proxy to be checked.
+    headers (dict): The request headers.
+
+    Returns:
+    int: The response status code, or None if the request failed.
+    """
+    try:
+        with requests.get(CHECK_URL, headers=headers, proxies={'http': f"http://{proxy}"}, timeout=REQUEST_TIMEOUT) as response:
+            return response.status_code
+    except Exception as e:
+        print("Exception: ", e)
+        return None
+
+def check_proxy_list(proxies):
+    """
+    Check a list of proxies, CONCURRENCY at a time, and move them to the working / not working tables.
+
+    The test requests run in a thread pool, the database is only updated from the calling thread.
+
+    Args:
+    proxies (list): The proxies to be checked.
+    """
+    proxies = [proxy for proxy in dict.fromkeys(proxies) if not is_quarantined(proxy)]
+    if CONCURRENCY <= 1:
+        for proxy in proxies:
+            check_proxy(proxy)
+        return
+    print(f"CHECKING {len(proxies)} PROXIES ({CONCURRENCY} AT A TIME)")
+    logger.info(f"CHECKING {len(proxies)} PROXIES")
+    headers = {proxy: fingerprints.headers_for(proxy) for proxy in proxies}
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        statuses = executor.map(lambda proxy: probe_proxy(proxy, headers[proxy]), proxies)
+        for proxy, status in zip(proxies, statuses):
+            if status is not None:
+                fingerprints.report(proxy, status in VALID_STATUSES)
+            record_proxy_result(proxy, status in VALID_STATUSES)
+            if status in VALID_STATUSES:
+                set_working(proxy)
+            else:
+                set_not_working(proxy)
+            logger.info(f"CHECKED PROXY: {proxy} -> {status}")
+
 def check_proxy(proxy: str=None): 
     """
     Check the validity of a given proxy by making a test request to a known endpoint.
+    Quarantined proxies are not checked until their cooldown expires.
 
     Args:
     proxy (str, optional): The proxy to be checked. If not provided, the function will use the 'get_random_proxy' function.
@@ -207,10 +715,19 @@ def check_proxy(proxy: str=None):
     Raises:
     Exception: If an exception occurs during the request or if the response status code is not in the VALID_STATUSES.
     """    
+    if is_quarantined(proxy):
+        return
     print("Sprawdzam proxy: " + proxy)
     info_str = "CHECKING PROXY: " + proxy
     logger.info(info_str)
-    get("http://ident.me/", proxy)
+    response = get(CHECK_URL, proxy)
+    if response is not None:
+        fingerprints.report(proxy, response.status_code in VALID_STATUSES)
+        record_proxy_result(proxy, response.status_code in VALID_STATUSES)
+        if response.status_code in VALID_STATUSES:
+            set_working(proxy)
+        else:
+            set_not_working(proxy)
        
 def reset_proxy(proxy): 
     """
@@ -223,9 +740,10 @@ def reset_proxy(proxy):
     This function removes the specified proxy from both the 'proxies_not_working' and 'proxies_working' tables and inserts
     it into the 'proxies_unchecked' table for further checking.
     """
-    db.insert("proxies_unchecked", (None, proxy.strip()))
-    db.delete_row(table_name = "proxies_not_working", condition_column = "ip_address", condition_value = proxy)
-    db.delete_row(table_name = "proxies_working", condition_column = "ip_address", condition_value = proxy)
+    with profiling_module.stage("db"):
+        db.insert("proxies_unchecked", (None, proxy.strip()))
+        db.delete_row(table_name = "proxies_not_working", condition_column = "ip_address", condition_value = proxy)
+        db.delete_row(table_name = "proxies_working", condition_column = "ip_address", condition_value = proxy)
     
 def set_working(proxy): 
     """
@@ -238,10 +756,11 @@ def set_working(proxy):
     This function inserts the specified working proxy into the 'proxies_working' table and removes it from both the
     'proxies_unchecked' and 'proxies_not_working' tables.
     """
-    if not db.check_value_in_column("proxies_working", "ip_address", proxy):
-        db.insert("proxies_working", (None, proxy.strip()))
-    db.delete_row(table_name = "proxies_unchecked", condition_column = "ip_address", condition_value = proxy)
-    db.delete_row(table_name = "proxies_not_working", condition_column = "ip_address", condition_value = proxy)
+    with profiling_module.stage("db"):
+        if not db.check_value_in_column("proxies_working", "ip_address", proxy):
+            db.insert("proxies_working", (None, proxy.strip()))
+        db.delete_row(table_name = "proxies_unchecked", condition_column = "ip_address", condition_value = proxy)
+        db.delete_row(table_name = "proxies_not_working", condition_column = "ip_address", condition_value = proxy)
 
 def set_not_working(proxy): 
     """
@@ -254,53 +773,121 @@ def set_not_working(proxy):
     This function inserts the specified not working proxy into the 'proxies_not_working' table and removes it from both
     the 'proxies_unchecked' and 'proxies_working' tables.
     """
-    db.insert("proxies_not_working", (None, proxy.strip()))
-    db.delete_row(table_name = "proxies_unchecked", condition_column = "ip_address", condition_value = proxy)
-    db.delete_row(table_name = "proxies_working", condition_column = "ip_address", condition_value = proxy)
+    with profiling_module.stage("db"):
+        db.insert("proxies_not_working", (None, proxy.strip()))
+        db.delete_row(table_name = "proxies_unchecked", condition_column = "ip_address", condition_value = proxy)
+        db.delete_row(table_name = "proxies_working", condition_column = "ip_address", condition_value = proxy)
 
 
-def get_bs_from_url(URL, proxy: str= None):
+def get_page(URL, proxy: str= None, stop_markers=None, page_type: str=None):
     """
-    Retrieve and parse the HTML content of a given URL using BeautifulSoup.
+    Retrieve a page which is worth parsing.
 
     This function makes multiple attempts to fetch the content from the specified URL, with an optional rotating proxy.
+    Every response is classified before parsing (see classifier_module): proxies which got a block, captcha,
+    soft ban or login page are moved to the not working table and quarantined, and the URL is retried with another proxy.
 
     Args:
     URL (str): The URL from which to retrieve HTML content.
     proxy (str, optional): The rotating proxy to be used for the request. If not provided, the request will be made without a proxy.
+    stop_markers (tuple, optional): Stop downloading the page once these byte strings have arrived (see 'read_body').
+    page_type (str, optional): "listing" for search result pages (enables the empty listing check) or "offer" for offer pages.
 
     Returns:
-    bs4.BeautifulSoup: A BeautifulSoup object representing the parsed HTML content of the URL.
+    requests.Response: The response, classified as OK, with the body already read.
 
     Raises:
     NameError: If too many unsuccessful attempts (more than 9) have been made to fetch the content.
+    PageSkipped: If the page doesn't exist or the listing stays empty, so there is nothing to parse.
     """
     counter = 0
+    empty_listings = 0
     while True:    
         if counter >= 9: raise NameError('TOO MANY TRIES!!!!')
         try:
             print("Try to get url: " + URL)
             if proxy is not None:
-                response = get(URL, proxy)
+                response = get(URL, proxy, stop_markers)
             else:
-                response = get(URL)
-            #print(response)
-            page = response.text
-            bs_from_url = BeautifulSoup(page)
+                response = get(URL, stop_markers=stop_markers)
+
+            with profiling_module.stage("classify"):
+                verdict = classifier_module.classify_response(response, page_type)
+            if response is not None:
+                fingerprints.report(response.proxy, verdict not in classifier_module.PROXY_FAILURES)
+                record_proxy_result(response.proxy, verdict not in classifier_module.PROXY_FAILURES)
+                # A captcha or block page with a valid status doesn't make the proxy working
+                if REPLAY_DIR is None:
+                    if response.status_code in VALID_STATUSES and verdict not in classifier_module.PROXY_FAILURES:
+                        set_working(response.proxy)
+                    else:
+                        set_not_working(response.proxy)
+            if verdict == classifier_module.NOT_FOUND:
+                raise PageSkipped("PAGE NOT FOUND: " + URL)
+            if verdict in classifier_module.PROXY_FAILURES:
+                print("RESPONSE CLASSIFIED AS: " + verdict)
+                logger.info("RESPONSE CLASSIFIED AS: " + verdict + " " + URL)
+                if response is not None:
+                    quarantine_proxy(response.proxy)
+                counter += 1
+                continue
+            if verdict == classifier_module.EMPTY_LISTING:
+                empty_listings += 1
+                if empty_listings >= EMPTY_LISTING_RETRIES:
+                    raise PageSkipped("EMPTY LISTING: " + URL)
+                counter += 1
+                continue
+
+            if CORPUS_DIR is not None and page_type is not None:
+                parser_module.save_to_corpus(os.path.join(CORPUS_DIR, page_type), URL, response.content)
 
             break
+        except PageSkipped:
+            raise
         except Exception as e_2:
             print(e_2) 
         counter +=1
     
-    return bs_from_url
+    return response
+
+
+def parse_page(response):
+    """
+    Parse the HTML of a response using BeautifulSoup.
+
+    Args:
+    response (requests.Response): The response returned by 'get_page'.
+
+    Returns:
+    bs4.BeautifulSoup: A BeautifulSoup object representing the parsed HTML content of the page.
+    """
+    with profiling_module.stage("parse"):
+        return BeautifulSoup(response.text)
+
+
+def get_bs_from_url(URL, proxy: str= None, stop_markers=None, page_type: str=None):
+    """
+    Retrieve and parse the HTML content of a given URL using BeautifulSoup (see 'get_page').
+
+    Args:
+    URL (str): The URL from which to retrieve HTML content.
+    proxy (str, optional): The rotating proxy to be used for the request.
+    stop_markers (tuple, optional): Stop downloading the page once these byte strings have arrived (see 'read_body').
+    page_type (str, optional): "listing" or "offer".
+
+    Returns:
+    bs4.BeautifulSoup: A BeautifulSoup object representing the parsed HTML content of the URL.
+    """
+    return parse_page(get_page(URL, proxy, stop_markers, page_type))
 
 
 def main():
 
     print("Wykonanie main")
 
-    check_proxies(db) 
+    # After a warm start the re-checked snapshot proxies are enough to start fetching
+    if REPLAY_DIR is None and not (warm_started and len(get_available_proxies(db)) >= MIN_WORKING_PROXIES):
+        check_proxies(db) 
 
     print("unchecked ->", db.get_row_count("proxies_unchecked")) # unchecked -> set() 
     print("working ->", db.get_row_count("proxies_working")) # working -> {"152.0.209.175:8080", ...} 
@@ -311,102 +898,127 @@ def main():
     omitted_urls_exceptions = []
 
     today_date_str = datetime.today().strftime('%d_%m_%Y')
-    file_url = "oto_dom_wroclaw_" + today_date_str 
-
-
-    with open(file_url, 'w', newline='', encoding="utf-8") as file:
-        csv_writer = csv.writer(file)
-        csv_writer.writerow(["titles","prices","location","area","price per square meter","numbers_of_rooms","urls","property_ownership","condition_of_property","floor","balcon_garden_terrace","amount_of_rent","parking_space","type_of_heating","primary_secondary","seller","year_of_construction","type_of_development","window","lift","utilities","security","home_furnishings","additional_info","bulding_material", "describe"])
-
-    #Here modify adress if want scrap from other localization    
-    URL = "https://www.otodom.pl/pl/wyniki/sprzedaz/mieszkanie/dolnoslaskie/wroclaw/wroclaw/wroclaw?limit=36&ownerTypeSingleSelect=ALL&by=DEFAULT&direction=DESC&viewType=listing"
-
-    bs = get_bs_from_url(URL)
-    page_last_number = int(bs.find_all('a', class_="eo9qioj1 css-5tvc2l edo3iif1")[-1].get_text())
-    print("LICZBA STRON DO PRZESZUKANIA: " + str(page_last_number))
-
-    for page_number in range(1, page_last_number + 1):   
-        URL_1 = URL + "&page=" + str(page_number)
-        bs = get_bs_from_url(URL_1)
+    file_url = OUTPUT_FILE_PREFIX + today_date_str 
+
+    if OUTPUT_FORMAT == "csv":
+        sink = export_module.make_sink(file_url)
+    else:
+        sink = export_module.make_sink(file_url, OUTPUT_FORMAT, row_group_size=ROW_GROUP_SIZE, compression=OUTPUT_COMPRESSION)
+    offer_store = offer_store_module.OfferStore(db)
+    crawl_date = datetime.today().strftime('%Y-%m-%d')
+    seen_offer_ids = set()
+    selector_monitor = parser_module.SelectorMonitor(SELECTOR_SAMPLE_SIZE, MIN_SELECTOR_HIT_RATE)
+    # The embedded JSON keys can drift like the selectors, they are checked separately
+    json_monitor = parser_module.SelectorMonitor(SELECTOR_SAMPLE_SIZE, MIN_SELECTOR_HIT_RATE, source="Embedded offer data")
+    offer_pages_fetched = 0
+    offer_pages_from_json = 0
+    summaries_written = 0
+
+    try:
+        URL = SEARCH_URL
+
+        # Pages with the embedded JSON state (__NEXT_DATA__) are read from it, the HTML is only parsed as a fallback
+        response = get_page(URL, stop_markers=parser_module.NEXT_DATA_STOP_MARKERS, page_type="listing")
+        page_last_number = parser_module.get_page_count(parser_module.find_next_data(response.content))
+        if page_last_number is None:
+            bs = parse_page(response)
+            page_last_number = int(bs.find_all('a', class_="eo9qioj1 css-5tvc2l edo3iif1")[-1].get_text())
+        print("LICZBA STRON DO PRZESZUKANIA: " + str(page_last_number))
+
+        for page_number in range(1, page_last_number + 1):   
+            URL_1 = URL + "&page=" + str(page_number)
+            try:
+                response = get_page(URL_1, stop_markers=parser_module.NEXT_DATA_STOP_MARKERS, page_type="listing")
+            except PageSkipped as e_3:
+                print(e_3)
+                continue
         
-        for offer in bs.find_all("a", class_="css-1hfdwlm e1dfeild2"):
-            offer_url = "https://www.otodom.pl" + offer['href']
+            with profiling_module.stage("extract"):
+                listing_offers = parser_module.listing_summaries_from_next_data(parser_module.find_next_data(response.content))
+            if not listing_offers:
+                bs = parse_page(response)
+                with profiling_module.stage("extract"):
+                    if SCRAPE_MODE == "summary":
+                        listing_offers = parser_module.extract_listing_summaries(bs)
+                    if not listing_offers:
+                        # No offer card was recognized: fetch every offer page
+                        listing_offers = [(offer_href, None) for offer_href in parser_module.extract_offer_links(bs)]
+            if SCRAPE_MODE != "summary":
+                listing_offers = [(offer_href, None) for offer_href, _ in listing_offers]
+
+            for offer_href, summary in listing_offers:
+                # First, so offers skipped with 'continue' don't delay the snapshot
+                maybe_save_pool_snapshot()
+                offer_url = "https://www.otodom.pl" + offer_href
+                offer_id = offer_store_module.parse_offer_id(offer_href)
+                # The same offer is often listed on several pages, scrape it once per crawl. It is only marked
+                # as seen once it is handled, so an offer whose page failed is retried on a later listing page.
+                if offer_id in seen_offer_ids:
+                    continue
         
 
-            try:
-                bs_offer = get_bs_from_url(offer_url)
-                information_list = []
-                
-                title = bs_offer.find( class_ = 'css-1wnihf5 efcnut38').get_text()
-                price = bs_offer.find( class_ = 'css-t3wmkv e1l1avn10').get_text().replace("\xa0","").replace("zł","").replace(" ","")
-                price_per_squered_meter = bs_offer.find( class_ = 'css-1h1l5lm efcnut39').get_text().replace("\xa0","").replace("zł/m²","").replace(" ","")
-                
-                if price == "Zapytajocenę" and price_per_squered_meter == "":
-                    print("Brak ceny, oferta zostanie pominięta")
-                    continue
-                    
-                location = bs_offer.find( class_ = 'css-z9gx1y e3ustps0') 
-                if location is not None:
-                    location = location.get_text().replace("\xa0","").replace("zł/m²","")       
-                else:
-                    location = None       
-                        
-                for information in bs_offer.find_all( class_ = 'enb64yk1'):
-                    information_list.append(information.get_text())
-
-                information_list = information_list[1::2]
-                apartment_area = information_list[0].replace(" m²","").replace("\xa0","")
-                number_of_rooms = information_list[2].replace(" ","")
-                property_ownership = information_list[1]
-                condition_of_property = information_list[3]
-                floor = information_list[4]
-                balcon_garden_terrace = information_list[5]
-                amount_of_rent = information_list[6]
-                parking_space = information_list[7]
-                type_of_heating = information_list[9]
-                    
-                if len(information_list) == 22:
-                    primary_secondary = information_list[10]
-                    seller = information_list[11]
-                    year_of_construction = information_list[13] 
-                    type_of_development = information_list[14]
-                    window = information_list[15]
-                    lift = information_list[16]
-                    utilities = information_list[17]
-                    security = information_list[18]
-                    home_furnishings = information_list[19]
-                    additional_info = information_list[20]
-                    bulding_material = information_list[21]
-                else: 
-                    primary_secondary = "brak informacji"
-                    seller = "brak informacji"
-                    year_of_construction = "brak informacji" 
-                    type_of_development = "brak informacji"
-                    window = "brak informacji"
-                    lift = "brak informacji"
-                    utilities = "brak informacji"
-                    security = "brak informacji"
-                    home_furnishings = "brak informacji"
-                    additional_info = "brak informacji"
-                    bulding_material = "brak informacji"                
-            
                 try:
-                    describe = bs_offer.find( class_ = 'e175i4j93').get_text().replace("\n"," ").replace("\xa0","").replace("\r"," ").replace("'"," ").replace('"',' ')
-                except Exception:
-                    describe = ""
-  
-
-                row_to_write = [title, price, location, apartment_area, price_per_squered_meter, number_of_rooms, offer_url, property_ownership, condition_of_property, floor, balcon_garden_terrace, amount_of_rent, parking_space, type_of_heating, primary_secondary, seller, year_of_construction, type_of_development, window, lift, utilities, security, home_furnishings, additional_info, bulding_material, describe]
-                with open(file_url, 'a', newline='', encoding="utf-8") as file:
-                    csv_writer = csv.writer(file)
-                    csv_writer.writerow(row_to_write)
+                    if summary is not None and offer_store.is_known(offer_id):
+                        # Known offer: the card has the tracked fields, the rest comes from the stored snapshot
+                        row_to_write = parser_module.build_summary_row(summary, offer_url, offer_store.get_offer(offer_id))
+                        if row_to_write is None:
+                            # No price to write, the same card gives the same result on another page
+                            seen_offer_ids.add(offer_id)
+                            continue
+                        with profiling_module.stage("write"):
+                            sink.write_row(row_to_write)
+                        with profiling_module.stage("db"):
+                            offer_store.record(offer_id, offer_url, {column: summary[column] for column in parser_module.SUMMARY_RECORDED_COLUMNS if summary[column] is not None}, crawl_date)
+                        seen_offer_ids.add(offer_id)
+                        summaries_written += 1
+                        continue
+
+                    offer_pages_fetched += 1
+                    response = get_page(offer_url, stop_markers=parser_module.NEXT_DATA_STOP_MARKERS, page_type="offer")
+                    with profiling_module.stage("extract"):
+                        ad = parser_module.find_offer_ad(response.content)
+                        if ad is not None:
+                            offer_pages_from_json += 1
+                            fields = parser_module.extract_ad_fields(ad)
+                            json_monitor.update(fields)
+                            json_monitor.check()
+                            row_to_write = parser_module.build_offer_row_from_ad(fields, offer_url)
+                    if ad is None:
+                        bs_offer = parse_page(response)
+                        with profiling_module.stage("extract"):
+                            fields = parser_module.extract_offer_fields(bs_offer)
+                            selector_monitor.update(fields)
+                            selector_monitor.check()
+                            row_to_write = parser_module.build_offer_row(fields, offer_url)
+                    if row_to_write is None:
+                        # Hidden price, refetching the page wouldn't change that
+                        seen_offer_ids.add(offer_id)
+                        continue
+                    with profiling_module.stage("write"):
+                        sink.write_row(row_to_write)
+                    with profiling_module.stage("db"):
+                        offer_store.record(offer_id, offer_url, dict(zip(export_module.CSV_COLUMNS, row_to_write)), crawl_date)
+                    seen_offer_ids.add(offer_id)
                 
-            except Exception as e_1:
-                print(e_1)
-                omitted_urls.append(offer_url)
-                omitted_urls_exceptions.append(e_1) 
+                except parser_module.SelectorDriftError:
+                    raise
+                except Exception as e_1:
+                    print(e_1)
+                    omitted_urls.append(offer_url)
+                    omitted_urls_exceptions.append(e_1) 
+
+    finally:
+        sink.close()
+        offer_store.flush()
+        save_pool_snapshot()
 
     print(omitted_urls)
+    print(f"OFFER PAGES FETCHED: {offer_pages_fetched} ({offer_pages_from_json} READ FROM EMBEDDED JSON), WRITTEN FROM LISTING SUMMARIES: {summaries_written}")
+    print("SELECTOR HIT RATES: " + selector_monitor.report())
+    print("EMBEDDED DATA HIT RATES: " + json_monitor.report())
 
 if __name__ == '__main__':
-    main()
+    # cli imports web_scraper: make it use this module instead of loading a second copy with separate globals
+    sys.modules['web_scraper'] = sys.modules[__name__]
+    import cli
+    sys.exit(cli.main(["scrape"] + sys.argv[1:]))